@@ -7,15 +7,183 @@ $Id$
 __headUrl__  = '$HeadURL$'
 
 import datetime as pydt
+import time
+import math
 import re
 import pytz
+from bisect import bisect_left, bisect_right, insort
+from fractions import gcd as _gcd
 import tztest
 import copy
 import babel.dates as babeldates
 from mx import DateTime as mxdt
 from oxylib.locale import makeLocale
+from oxylib.customtypes import LRUCache
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
+# absolute date (days since 0001-01-01, day 1) of 1970-01-01
+_EPOCH_ABSDATE = pydt.date(1970,1,1).toordinal()
+_EPOCH = pydt.datetime(1970,1,1)
+_INF = float('inf')
+
+def _seconds(td):
+    """
+    @brief Hidden function. Total seconds of a python timedelta
+    """
+    return td.days*86400 + td.seconds
+
+def _offsetString(seconds):
+    """
+    @brief Hidden function. Formats an offset from UTC as +hh:mm
+    """
+    sign = "+"
+    if seconds < 0: sign = "-"
+    hours, minutes = divmod(abs(int(seconds))//60, 60)
+    return "%s%02d:%02d" % (sign,hours,minutes)
+
+def _mxWallticks(mxObj):
+    """
+    @brief Hidden function. Wall time of a mxDateTime as seconds since epoch
+    """
+    return (mxObj.absdate - _EPOCH_ABSDATE)*86400 + mxObj.abstime
+
+def _mxMicroseconds(mxDelta):
+    """
+    @brief Hidden function. Integer microseconds of a mxDateTimeDelta
+    """
+    return int(round(mxDelta.seconds*1000000))
+
+def _mxFromTicks(ticks,timezone):
+    """
+    @brief Hidden function. Wall time of an instant in a timezone
+    @param ticks seconds since epoch (UTC)
+    @param timezone TimeZone object
+    @return mxDateTime object
+    """
+    days, seconds = divmod(ticks + timezone._offsetFromTicks(ticks), 86400)
+    return mxdt.DateTimeFromAbsDateTime(int(days) + _EPOCH_ABSDATE, seconds)
+
+def _mxBounds(mxObj,unit):
+    """
+    @brief Hidden function. Wall time start and end of a calendar period
+    @param mxObj mxDateTime object (wall time)
+    @param unit 'year', 'month', 'week' (starting on monday) or 'day'
+    @return tuple of mxDateTime objects (first second, last second)
+    """
+    if unit == 'year':
+        start = mxdt.DateTime(mxObj.year,1,1)
+        absdate = mxdt.DateTime(mxObj.year+1,1,1).absdate
+    elif unit == 'month':
+        year, month = divmod(mxObj.year*12 + mxObj.month, 12)
+        start = mxdt.DateTime(mxObj.year,mxObj.month,1)
+        absdate = mxdt.DateTime(year,month+1,1).absdate
+    elif unit == 'week':
+        absdate = mxObj.absdate - mxObj.day_of_week
+        start = mxdt.DateTimeFromAbsDateTime(absdate,0)
+        absdate += 7
+    elif unit == 'day':
+        absdate = mxObj.absdate
+        start = mxdt.DateTimeFromAbsDateTime(absdate,0)
+        absdate += 1
+    else:
+        raise Exception("Unknown unit '%s', use one of 'year', 'month', 'week', 'day'" % unit)
+    return (start, mxdt.DateTimeFromAbsDateTime(absdate-1,86399))
+
+#############################################################################
+
+# -- ISO 8601 parsing
+
+# YYYY-MM-DD[Thh:mm[:ss[.ffffff]]][Z|+hh:mm] [zone]
+_isoRe = re.compile(r'^(\d{4})-(\d{2})-(\d{2})'
+                    r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,6})\d*)?)?)?'
+                    r'(?:(Z)|([+-])(\d{2}):?(\d{2}))?'
+                    r'(?: (\S+))?$')
+# free form date followed by a zone name (fuzzy parsing)
+_zoneSuffixRe = re.compile(r'^(\d+-\d+-\d+(?:T\d+:\d+:\d+)?) (.+)$')
+
+def _parseISO(string):
+    """
+    @brief Hidden function. Strict ISO 8601 parser
+    @param string a datetime string
+    @return tuple (wall time as mxDateTime, offset in seconds or None, zone name or None),
+            None if string is not ISO 8601
+    """
+    m = _isoRe.match(string)
+    if not m: return None
+    year, month, day, hour, minute, second, fraction, utc, sign, offh, offm, zone = m.groups()
+    second = int(second or 0)
+    if fraction: second += int(fraction) / 10.0**len(fraction)
+    try:
+        wall = mxdt.DateTime(int(year),int(month),int(day),int(hour or 0),int(minute or 0),second)
+    except Exception:
+        return None
+    return (wall, _isoOffset(utc,sign,offh,offm), zone)
+
+def _isoOffset(utc,sign,offh,offm):
+    """
+    @brief Hidden function. Offset in seconds of the matched groups of _isoRe, None if missing
+    """
+    if utc: return 0
+    if not sign: return None
+    offset = int(offh)*3600 + int(offm)*60
+    if sign == "-": offset = -offset
+    return offset
+
+def _isoWall(string):
+    """
+    @brief Hidden function. Strict ISO 8601 parser to whole wall clock seconds,
+           without mx objects (see DateTime.parse_many)
+    @param string a datetime string
+    @return tuple (wall time as seconds since epoch, offset in seconds or None, zone name or None)
+    """
+    m = _isoRe.match(string)
+    if not m: raise ValueError, "'%s' is not an ISO 8601 datetime" % string
+    year, month, day, hour, minute, second, fraction, utc, sign, offh, offm, zone = m.groups()
+    wall = pydt.datetime(int(year),int(month),int(day),int(hour or 0),int(minute or 0),int(second or 0))
+    return (_seconds(wall - _EPOCH), _isoOffset(utc,sign,offh,offm), zone)
+
+def _mxFromISO(iso,timezone):
+    """
+    @brief Hidden function. Wall time in timezone of a parsed ISO string
+    @param iso a tuple returned by _parseISO
+    @param timezone TimeZone object
+    @return mxDateTime object
+    """
+    wall, offset, zone = iso
+    if offset is None: return wall
+    return _mxFromTicks(_mxWallticks(wall) - offset,timezone)
+
+#############################################################################
+
+# zone -> transition table
+_transitionTables = {}
+
+def _transitionTable(tzinfo):
+    """
+    @brief Hidden function. Transition table of a pytz timezone, built once per zone
+    @param tzinfo a pytz timezone
+    @return tuple (utc transitions, local transitions, offsets, dsts, tznames)
+            parallel lists sorted by transition, times and offsets in seconds
+    """
+    table = _transitionTables.get(tzinfo.zone)
+    if table is None:
+        if getattr(tzinfo, "_utc_transition_times", None):
+            utc = [_seconds(t - _EPOCH) for t in tzinfo._utc_transition_times]
+            infos = tzinfo._transition_info
+        else:
+            # StaticTzInfo and UTC: one period
+            utc = [_seconds(pydt.datetime.min - _EPOCH)]
+            infos = [(tzinfo.utcoffset(None), tzinfo.dst(None), tzinfo.tzname(None))]
+        offsets = [_seconds(i[0]) for i in infos]
+        dsts = [_seconds(i[1]) for i in infos]
+        names = [i[2] for i in infos]
+        local = [t + o for t, o in zip(utc, offsets)]
+        table = _transitionTables.setdefault(tzinfo.zone, (utc, local, offsets, dsts, names))
+    return table
 
 #############################################################################
 #############################################################################
@@ -25,15 +193,28 @@ from oxylib.locale import makeLocale
 class TimeZone(object):
     """
     @brief Class for managing Time Zones. (Wrapper for pytz.timezone)
+           Instances are shared: one TimeZone per zone name.
     @param zone Zone name (for reference see pytz.common_timezones)
     """
 
+    # zone name -> TimeZone
+    _registry = {}
+
+    def __new__(cls,zone=None):
+        if not zone: zone = "UTC"
+        obj = cls._registry.get(zone)
+        if obj is None:
+            obj = object.__new__(cls)
+            obj.__dict__["_timezone"] = pytz.timezone(zone)
+            obj.__dict__["_table"] = _transitionTable(obj._timezone)
+            obj = cls._registry.setdefault(zone,obj)
+        return obj
+
     def __init__(self,zone=None):
         """
         TimeZone("TimeZoneName") # e.g. "Europe/London", "US/Pacific"...
         """
-        if not zone: zone = "UTC"
-        self.__dict__["_timezone"] = pytz.timezone(zone)
+        # initialized once, in __new__
 
     def __setattr__(self,arg,value):
         raise AttributeError, "TimeZone objects are read only"
@@ -48,7 +229,8 @@ class TimeZone(object):
 
     #############################################################################
 
-    def __copy__(self): return copy.deepcopy(self)
+    def __copy__(self): return self
+    def __deepcopy__(self,memo): return self
 
     #############################################################################
 
@@ -74,13 +256,33 @@ class TimeZone(object):
 
     #############################################################################
 
+    @property
+    def _deltas(self):
+        """
+        @brief Hidden property. (utcoffset, dst) TimeDelta objects of every transition
+        """
+        deltas = self.__dict__.get("_deltaTable")
+        if deltas is None:
+            deltas = [(TimeDelta(seconds=o),TimeDelta(seconds=d)) for o, d in zip(self._table[2],self._table[3])]
+            self.__dict__["_deltaTable"] = deltas
+        return deltas
+
+    def _index(self,DateTimeObj):
+        """
+        @brief Hidden function. Transition in effect at the wall time of DateTimeObj
+               (ambiguous and non existent wall times resolve to standard time)
+        @param DateTimeObj a DateTime object
+        @return index in the transition table
+        """
+        return max(bisect_right(self._table[1],DateTimeObj._wallticks) - 1, 0)
+
     def dst(self,DateTimeObj):
         """
         @brief Returns the Daylight Saving Time Offset
         @param DateTimeObj a DateTime object
         @return TimeDelta object
         """
-        return TimeDelta(seconds=self._timezone.dst(DateTimeObj.todatetime()).seconds)
+        return self._deltas[self._index(DateTimeObj)][1]
 
     def tzname(self,DateTimeObj):
         """
@@ -88,7 +290,7 @@ class TimeZone(object):
         @param DateTimeObj a DateTime object
         @return string
         """
-        return self._timezone.tzname(DateTimeObj.todatetime())
+        return self._table[4][self._index(DateTimeObj)]
 
     def utcoffset(self,DateTimeObj):
         """
@@ -96,10 +298,15 @@ class TimeZone(object):
         @param DateTimeObj a DateTime object
         @return TimeDelta object
         """
-        offset = self._timezone.utcoffset(DateTimeObj.todatetime())
-        if offset.days < 0: offset = offset.seconds*offset.days
-        else: offset = offset.seconds
-        return TimeDelta(seconds=offset)
+        return self._deltas[self._index(DateTimeObj)][0]
+
+    def _offsetFromTicks(self,ticks):
+        """
+        @brief Hidden function. Total offset from UTC at a given instant
+        @param ticks seconds since epoch (UTC)
+        @return offset in seconds
+        """
+        return self._table[2][max(bisect_right(self._table[0],ticks) - 1, 0)]
 
     @property
     def zone(self):
@@ -139,7 +346,11 @@ class DateTime(object):
     @param *args,**kwargs Can handle parsing strings, numbers and keywords.
            Can specify "tz", a TimeZone() object (as LAST argument).
     """
+    __slots__ = ("_mxObj", "timezone")
+
     isostr = "%Y-%m-%dT%H:%M:%S"
+    # current instant, seconds since epoch (see setClock)
+    _clock = staticmethod(time.time)
 
     def __new__(cls,*args,**kwargs):
         # needed for composite
@@ -160,6 +371,7 @@ class DateTime(object):
 
         # set default timezone
         timezone = TimeZone()
+        iso = None
 
         # *******
         if args:
@@ -181,12 +393,17 @@ class DateTime(object):
 
             # *******
             if len(args) == 1 and isinstance(args[0],(str,unicode)):
-                # ("ISO") iso with timezone
-                m = re.search('^(\d+-\d+-\d+(?:T\d+:\d+:\d+)?) (.+)$',args[0])
-                if m:
-                    g = m.groups()
-                    args = (g[0],)
-                    timezone = TimeZone(g[1])
+                # ("ISO") strict iso, with optional offset and timezone
+                iso = _parseISO(args[0])
+                if iso:
+                    if iso[2]: timezone = TimeZone(iso[2])
+                else:
+                    # ("ISO") iso with timezone, fuzzy parsing
+                    m = _zoneSuffixRe.search(args[0])
+                    if m:
+                        g = m.groups()
+                        args = (g[0],)
+                        timezone = TimeZone(g[1])
             if len(args) == 1 and isinstance(args[0],(pydt.datetime,pydt.date)):
                 # (datetime) from pydt.datetime
                 args = (self._parsedatetime(args[0]),)
@@ -201,24 +418,34 @@ class DateTime(object):
             if isinstance(kwargs["tz"],TimeZone): timezone = kwargs["tz"]
             del kwargs['tz']
 
+        if iso:
+            mxObj = _mxFromISO(iso,timezone)
         #if no input use NOW
-        if not(args or kwargs):
-            # Get current date and time, apply system timezone and then convert to given timezone (default UTC)
-            args = (DateTime(mxdt.now().strftime(self.isostr),TimeZone(tztest.get_zone())).toTZ(timezone)._mxObj,)
+        elif not(args or kwargs):
+            # Current instant in the given timezone (default UTC)
+            mxObj = _mxFromTicks(DateTime._clock(),timezone)
+        else:
+            mxObj = mxdt.DateTimeFrom(*args,**kwargs)
 
         # *******
 
         #sets read-only properties
-        self.__dict__["_mxObj"] = mxdt.DateTimeFrom(*args,**kwargs)
-        self.__dict__["timezone"] = timezone
-        self.__dict__["zone"] = self.timezone.zone
-        self.__dict__["dst"] = self.timezone.dst(self)
-        self.__dict__["tzname"] = self.timezone.tzname(self)
-        self.__dict__["utcoffset"] = self.timezone.utcoffset(self)
+        #zone, dst, tzname and utcoffset are computed on access
+        object.__setattr__(self,"_mxObj",mxObj)
+        object.__setattr__(self,"timezone",timezone)
 
     def __setattr__(self,arg,value):
         raise AttributeError, "DateTime objects are read only"
 
+    @property
+    def zone(self): return self.timezone.zone
+    @property
+    def dst(self): return self.timezone.dst(self)
+    @property
+    def tzname(self): return self.timezone.tzname(self)
+    @property
+    def utcoffset(self): return self.timezone.utcoffset(self)
+
     # COMPOSITE VALUES
     def __composite_values__(self):
         return (self,self.timezone)
@@ -247,8 +474,118 @@ class DateTime(object):
     # collide copy and deepcopy
     def __copy__(self): return copy.deepcopy(self)
 
+    # DateTime and Date are pickled through copy_reg (see PICKLING),
+    # subclasses here, in the same compact form
+    def __reduce__(self):
+        return (_loadDateTime,(self.__class__,_dumpDateTime(self)))
+
+    def __setstate__(self,state):
+        r"""
+        @brief Restores pickles holding the instance state: Date and the subclasses
+               pickled before __slots__ (the instance __dict__, zone fields included,
+               which are computed on access now) or with the slots state
+        @param state dict, or tuple (None, dict of slots)
+
+        A Date pickled before __slots__ (the mx object written as a
+        DateTimeFromAbsDateTime call)
+
+        >>> import pickle
+        >>> old = ("ccopy_reg\n_reconstructor\np0\n(coxylib.DateTime\nDate\np1\nc__builtin__\nobject\np2\nNtp3\nRp4\n"
+        ...        "(dp5\nS'zone'\np6\nS'Europe/Rome'\np7\nsS'dst'\np8\ncoxylib.DateTime\n_PTD\np9\n(S'00'\np10\ntp11\nRp12\n"
+        ...        "sS'utcoffset'\np13\ng9\n(S'01:00:00'\np14\ntp15\nRp16\nsS'tzname'\np17\nS'CET'\np18\n"
+        ...        "sS'timezone'\np19\ncoxylib.DateTime\n_PTZ\np20\n(g7\ntp21\nRp22\n"
+        ...        "sS'_mxObj'\np23\ncmx.DateTime\nDateTimeFromAbsDateTime\np24\n(I734223\nF0.0\ntp25\nRp26\nsb.")
+        >>> d = pickle.loads(old)
+        >>> d, d.utcoffset
+        (<Date('2011-03-27')>, <TimeDelta('01:00:00')>)
+        >>> pickle.loads(pickle.dumps(d, 2)) == d
+        True
+
+        Subclasses are reduced in the compact form
+
+        >>> class Deadline(DateTime): pass
+        >>> d = Deadline(2011,3,27,3,30,0,TimeZone('Europe/Rome'))
+        >>> copy.deepcopy(d)
+        <Deadline('2011-03-27T03:30:00 Europe/Rome')>
+        >>> d.__reduce__()[1][1]
+        (2, 1301196600, 0, 'Europe/Rome')
+        """
+        if isinstance(state,tuple): state = state[1]
+        object.__setattr__(self,"_mxObj",state["_mxObj"])
+        object.__setattr__(self,"timezone",state["timezone"])
+
     #############################################################################
 
+    @classmethod
+    def _fromMx(cls,mxObj,timezone):
+        """
+        @brief Hidden classmethod. Builds a DateTime straight from a mxDateTime
+        @param mxObj mxDateTime object (wall time in timezone)
+        @param timezone TimeZone object
+        @return DateTime object
+        """
+        obj = object.__new__(cls)
+        object.__setattr__(obj,"_mxObj",mxObj)
+        object.__setattr__(obj,"timezone",timezone)
+        return obj
+
+    @classmethod
+    def _fromTicks(cls,ticks,timezone):
+        """
+        @brief Hidden classmethod. Builds a DateTime from epoch ticks
+        @param ticks seconds since epoch (UTC)
+        @param timezone TimeZone object
+        @return DateTime object
+        """
+        return cls._fromMx(_mxFromTicks(ticks,timezone),timezone)
+
+    @classmethod
+    def _fromDatetime(cls,datetimeObj,timezone):
+        """
+        @brief Hidden classmethod. Builds a DateTime straight from a python datetime
+               (or date), keeping microseconds. Naive values are UTC, as in
+               DateTime(datetime), aware values are moved by their utcoffset
+        @param datetimeObj datetime or date object
+        @param timezone TimeZone object of the result
+        @return DateTime object
+        """
+        d = datetimeObj
+        offset = 0
+        if isinstance(d,pydt.datetime):
+            mxObj = mxdt.DateTime(d.year,d.month,d.day,d.hour,d.minute,d.second + d.microsecond/1e6)
+            if d.tzinfo is not None: offset = _seconds(d.utcoffset())
+        else:
+            mxObj = mxdt.DateTime(d.year,d.month,d.day)
+        ticks = _mxWallticks(mxObj) - offset
+        if timezone._offsetFromTicks(ticks) != offset:
+            mxObj = _mxFromTicks(ticks,timezone)
+        return cls._fromMx(mxObj,timezone)
+
+    @classmethod
+    def now(cls,tz=None):
+        """
+        @brief Classmethod returning the current instant
+        @param tz TimeZone object (default UTC)
+        @return DateTime object
+        """
+        return cls._fromTicks(DateTime._clock(),tz or TimeZone())
+
+    @classmethod
+    def utcnow(cls):
+        """
+        @brief Classmethod returning the current instant in UTC
+        @return DateTime object
+        """
+        return cls._fromTicks(DateTime._clock(),TimeZone())
+
+    @classmethod
+    def setClock(cls,clock=None):
+        """
+        @brief Classmethod to replace the clock used for the current instant (e.g. in tests)
+        @param clock callable returning seconds since epoch (None restores time.time)
+        """
+        DateTime._clock = staticmethod(clock or time.time)
+
     @classmethod
     def _parsedatetime(cls,datetimeObj):
         """
@@ -261,6 +598,24 @@ class DateTime(object):
             t.extend((datetimeObj.hour,datetimeObj.minute,datetimeObj.second))
         return cls(*t)
 
+    @classmethod
+    def fromISO(cls,string,tz=None):
+        """
+        @brief Classmethod to parse a strict ISO 8601 string
+               YYYY-MM-DD[Thh:mm[:ss[.ffffff]]][Z|+hh:mm] [zone]
+        @param string a datetime string
+        @param tz TimeZone of the result (default: zone in string or UTC)
+        @return DateTime object
+        """
+        iso = _parseISO(string)
+        if iso is None:
+            raise ValueError, "'%s' is not an ISO 8601 datetime" % string
+        source = iso[2] and TimeZone(iso[2]) or tz or TimeZone()
+        obj = cls._fromMx(_mxFromISO(iso,source),source)
+        if tz and tz != source:
+            obj = cls._fromTicks(obj.gmticks,tz)
+        return obj
+
     @classmethod
     def strptime(cls,string,pattern):
         """
@@ -272,6 +627,221 @@ class DateTime(object):
         t = pydt.datetime.strptime(string,pattern)
         return cls(t)
 
+    # strptime patterns tried, in order, by parse_many
+    inferPatterns = ["%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d",
+                     "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
+                     "%m/%d/%Y %H:%M:%S", "%m/%d/%Y",
+                     "%d.%m.%Y %H:%M:%S", "%d.%m.%Y",
+                     "%Y%m%d%H%M%SZ", "%Y%m%d%H%M%S", "%Y%m%d"]
+
+    @classmethod
+    def _inferPattern(cls,string,pattern):
+        """
+        @brief Hidden classmethod. Format of a column whose first value is string
+        @return "iso", a strptime pattern or None (fuzzy parsing)
+        """
+        if pattern is not None: return pattern
+        if _parseISO(string): return "iso"
+        for p in cls.inferPatterns:
+            try:
+                pydt.datetime.strptime(string,p)
+            except ValueError:
+                continue
+            return p
+        return None
+
+    @classmethod
+    def _inferParser(cls,string,pattern,tz):
+        """
+        @brief Hidden classmethod. Parser for a column whose first value is string
+        @return a function string -> DateTime object, raising ValueError
+        """
+        pattern = cls._inferPattern(string,pattern)
+        if pattern == "iso":
+            return lambda s: cls.fromISO(s,tz)
+        timezone = tz or TimeZone()
+        if pattern is None:
+            # unknown format, fuzzy parsing for every value
+            def parse(s):
+                try:
+                    return cls(s,timezone)
+                except Exception, e:
+                    raise ValueError, str(e)
+            return parse
+        def parse(s):
+            t = pydt.datetime.strptime(s,pattern)
+            mxObj = mxdt.DateTime(t.year,t.month,t.day,t.hour,t.minute,t.second + t.microsecond/1e6)
+            return cls._fromMx(mxObj,timezone)
+        return parse
+
+    @classmethod
+    def _inferWallParser(cls,string,pattern,tz):
+        """
+        @brief Hidden classmethod. As _inferParser, without building DateTime objects
+        @return a function string -> (seconds, offset, zone), raising ValueError.
+                seconds are whole wall clock seconds since epoch, in UTC if offset
+                is given, else in zone (a TimeZone) or in the TimeZone of the column
+        """
+        pattern = cls._inferPattern(string,pattern)
+        if pattern == "iso":
+            def parse(s):
+                seconds, offset, zone = _isoWall(s)
+                return (seconds, offset, zone and TimeZone(zone))
+            return parse
+        if pattern is None:
+            # unknown format, fuzzy parsing for every value
+            timezone = tz or TimeZone()
+            def parse(s):
+                try:
+                    return (int(math.floor(cls(s,timezone).gmticks)), 0, None)
+                except Exception, e:
+                    raise ValueError, str(e)
+            return parse
+        def parse(s):
+            return (_seconds(pydt.datetime.strptime(s,pattern) - _EPOCH), None, None)
+        return parse
+
+    @classmethod
+    def parse_many(cls,strings,pattern=None,tz=None,asArray=False):
+        """
+        @brief Classmethod to parse a column of strings sharing one format.
+               The format is inferred once, from the first non empty value
+               (ISO 8601, else the first of inferPatterns matching it)
+        @param strings list of datetime strings
+        @param pattern an strftime pattern (default inferred)
+        @param tz TimeZone of the values (default: zone in ISO strings or UTC)
+        @param asArray return a DateTimeArray (whole seconds) instead of a list,
+               built from the parsed fields without DateTime objects. Needs numpy
+        @return tuple (values, errors), with asArray (values, valid, errors)
+                values: list of DateTime objects (None for empty and bad values)
+                        or, with asArray, a DateTimeArray of the good values only
+                valid: numpy boolean array, True for the rows of strings in values
+                       (values[k] is the k-th True row)
+                errors: list of (index, value, reason) of the values that could not
+                        be parsed (bad format, unknown zone, not a string)
+
+        Around the start of DST in Rome, an empty and a bad value
+
+        >>> rows = ["2011-03-27T01:30:00", "", "2011-03-27T03:30:00", "bad", "2011-03-27T01:30:00Z"]
+        >>> values, errors = DateTime.parse_many(rows, tz=TimeZone('Europe/Rome'))
+        >>> values[2]
+        <DateTime('2011-03-27T03:30:00 Europe/Rome')>
+        >>> values[1], values[3], errors
+        (None, None, [(3, 'bad', "'bad' is not an ISO 8601 datetime")])
+        >>> array, valid, errors = DateTime.parse_many(rows, tz=TimeZone('Europe/Rome'), asArray=True)
+        >>> print ", ".join(array.formatISO())
+        2011-03-27T01:30:00+01:00, 2011-03-27T03:30:00+02:00, 2011-03-27T03:30:00+02:00
+        >>> valid.tolist(), errors
+        ([True, False, True, False, True], [(3, 'bad', "'bad' is not an ISO 8601 datetime")])
+        >>> (array == DateTimeArray.fromList([v for v in values if v])).all()
+        True
+
+        The format of the first value is used for the whole column
+
+        >>> array, valid, errors = DateTime.parse_many(["27/03/2011 03:30", "28/03/2011 12:00", "29/03/2011"], asArray=True)
+        >>> print array
+        [2011-03-27T03:30:00, 2011-03-28T12:00:00] UTC
+        >>> [error[:2] for error in errors]
+        [(2, '29/03/2011')]
+
+        A bad row is reported alone: unknown zones and values that are not
+        strings (None is empty)
+
+        >>> rows = [42, "2011-03-27T01:30:00 Europe/Nowhere", None, "2011-03-27T03:30:00 Europe/Rome"]
+        >>> values, errors = DateTime.parse_many(rows)
+        >>> values
+        [None, None, None, <DateTime('2011-03-27T03:30:00 Europe/Rome')>]
+        >>> [error[:2] for error in errors]
+        [(0, 42), (1, '2011-03-27T01:30:00 Europe/Nowhere')]
+        >>> array, valid, errors = DateTime.parse_many(rows, asArray=True)
+        >>> print array
+        [2011-03-27T03:30:00] Europe/Rome
+        >>> valid.tolist(), [error[:2] for error in errors]
+        ([False, False, False, True], [(0, 42), (1, '2011-03-27T01:30:00 Europe/Nowhere')])
+        """
+        if asArray and numpy is None:
+            raise ImportError, "DateTimeArray needs numpy"
+        values = []
+        errors = []
+        parse = None
+        for i, string in enumerate(strings):
+            if not string:
+                values.append(None)
+                continue
+            try:
+                if parse is None:
+                    if asArray: parse = cls._inferWallParser(string,pattern,tz)
+                    else: parse = cls._inferParser(string,pattern,tz)
+                values.append(parse(string))
+            except (ValueError,TypeError,pytz.UnknownTimeZoneError), e:
+                values.append(None)
+                errors.append((i,string,str(e)))
+        if asArray:
+            values, valid = DateTimeArray._fromParsed(values,tz)
+            return (values, valid, errors)
+        return (values, errors)
+
+    @classmethod
+    def range(cls,start,end,step):
+        """
+        @brief Classmethod generator of DateTimes from start (included) to end (excluded).
+               A TimeDelta step is elapsed time (exact seconds between values, also
+               across DST changes), a RelativeDateTime step follows the wall calendar
+               of start's TimeZone (e.g. oneDay keeps the time of day, oneMonth the day).
+               The n-th value is computed from start, errors do not accumulate.
+        @param start DateTime object
+        @param end DateTime object
+        @param step TimeDelta or RelativeDateTime object, may be negative.
+               A RelativeDateTime needs a relative field (years...seconds),
+               absolute fields alone would give the same value forever
+        @return generator of DateTime objects, ValueError if a value does not
+                strictly advance on the previous one
+
+        Across the start of DST in Rome
+
+        >>> tz = TimeZone('Europe/Rome')
+        >>> start, end = DateTime(2011,3,26,12,0,0,tz), DateTime(2011,3,29,0,0,0,tz)
+        >>> [str(d) for d in DateTime.range(start, end, TimeDelta(hours=24))]
+        ['2011-03-26T12:00:00 Europe/Rome', '2011-03-27T13:00:00 Europe/Rome', '2011-03-28T13:00:00 Europe/Rome']
+        >>> [str(d) for d in DateTime.range(start, end, oneDay)]
+        ['2011-03-26T12:00:00 Europe/Rome', '2011-03-27T12:00:00 Europe/Rome', '2011-03-28T12:00:00 Europe/Rome']
+        >>> [str(d) for d in DateTime.range(end, start, -oneDay)]
+        ['2011-03-29T00:00:00 Europe/Rome', '2011-03-28T00:00:00 Europe/Rome', '2011-03-27T00:00:00 Europe/Rome']
+        >>> list(DateTime.range(start, end, RelativeDateTime(day=15)))
+        Traceback (most recent call last):
+        ...
+        ValueError: step must have a relative field
+        """
+        timezone = start.timezone
+        endticks = end.gmticks
+        if isinstance(step,TimeDelta):
+            seconds = step.seconds
+            if not seconds: raise ValueError, "step must not be zero"
+            startticks = ticks = start.gmticks
+            n = 0
+            while (ticks < endticks if seconds > 0 else ticks > endticks):
+                yield cls._fromTicks(ticks,timezone)
+                n += 1
+                ticks = startticks + n*seconds
+        elif isinstance(step,RelativeDateTime):
+            if not [f for f in step._key[:len(RelativeDateTime._relativeFields)] if f]:
+                raise ValueError, "step must have a relative field"
+            startticks = start.gmticks
+            if (start + step).gmticks == startticks: raise ValueError, "step must not be zero"
+            forward = (start + step).gmticks > startticks
+            value = start
+            ticks = startticks
+            n = 0
+            while (ticks < endticks if forward else ticks > endticks):
+                yield value
+                n += 1
+                previous, value = value, start + step*n
+                ticks, previousticks = value.gmticks, ticks
+                if (ticks <= previousticks if forward else ticks >= previousticks):
+                    raise ValueError, "step does not advance after %s" % previous
+        else:
+            raise TypeError, "supports only TimeDelta and RelativeDateTime objects"
+
 
     #############################################################################
 
@@ -311,6 +881,15 @@ class DateTime(object):
     def second(self): return self._mxObj.second
     @property
     def ticks(self): return self._mxObj.ticks()
+    @property
+    def gmticks(self):
+        """
+        @brief Seconds since epoch of this instant (UTC)
+        """
+        return self._wallticks - self.utcoffset.seconds
+    @property
+    def _wallticks(self):
+        return _mxWallticks(self._mxObj)
 
     #############################################################################
 
@@ -321,7 +900,7 @@ class DateTime(object):
         """
         t=self.tuple()[:6]
         t=[e for e in t]
-        if tzinfo: t.extend((0,pytz.timezone(self.zone)))
+        if tzinfo: t.extend((0,self.timezone._timezone))
         return pydt.datetime(*t)
 
     def tomxDateTime(self):
@@ -340,9 +919,7 @@ class DateTime(object):
         @return DateTime object
         """
         if self.timezone == tz: return self
-        offset = tz.utcoffset(self)-self.utcoffset
-        #return DateTime((self + offset).strftime(self.isostr),tz) #heavier way
-        return DateTime((self._mxObj + offset._mxObj).strftime(self.isostr),tz) #lighter way
+        return DateTime._fromTicks(self.gmticks,tz)
 
     def toUTC(self):
         """
@@ -365,7 +942,7 @@ class DateTime(object):
         @brief Gets current Time (ignore TZ)
         @return TimeDelta object
         """
-        return TimeDelta(self.strftime("%H:%M:%S"))
+        return TimeDelta._fromMicroseconds(((self.hour*60 + self.minute)*60 + int(self.second))*1000000)
 
     def getDate(self,tz=None):
         """
@@ -373,7 +950,7 @@ class DateTime(object):
         @param tz optional tz (default UTC)
         @return DateTime object
         """
-        return DateTime(self.strftime("%Y-%m-%d"),tz or TimeZone())
+        return DateTime._fromMx(mxdt.DateTime(self.year,self.month,self.day),tz or TimeZone())
 
     #############################################################################
 
@@ -382,27 +959,25 @@ class DateTime(object):
         @brief Return start and end of the year
         @return a tuple containing start and end of year as DateTime objects
         """
-        start = DateTime(year=self.year, day=1, month=1,tz=self.timezone)
-        end = start+oneYear-oneSecond
-        return (start, end)
+        return self._bounds('year')
 
     def monthBoundary(self):
         """
         @brief Return start and end of the month
         @return a tuple containing start and end of month as DateTime objects
         """
-        start = DateTime(year=self.year, month=self.month, day=1, tz=self.timezone)
-        end = start+oneMonth-oneSecond
-        return (start, end)
+        return self._bounds('month')
 
     def weekBoundary(self):
         """
         @brief Return start and end of the week
         @return a tuple containing start and end of week as DateTime objects
         """
-        start = self.getDate(tz=self.timezone)+RelativeDateTime(weekday=(0,0))
-        end = start+oneWeek-oneSecond
-        return (start, end)
+        return self._bounds('week')
+
+    def _bounds(self,unit):
+        start, end = _mxBounds(self._mxObj,unit)
+        return (DateTime._fromMx(start,self.timezone), DateTime._fromMx(end,self.timezone))
 
     #############################################################################
 
@@ -445,22 +1020,7 @@ class DateTime(object):
         """
 
         if not locale: locale = makeLocale()
-
-        if format == 'notYear':
-            if part == 'date':
-                pattern=locale.date_formats['short'].pattern
-                pattern=pattern.replace('/yyyy', '')
-                pattern=pattern.replace('yyyy/', '')
-                pattern=pattern.replace('/yy', '')
-                pattern=pattern.replace('yy/', '')
-                format=pattern
-            if part == 'time':
-                format='short'
-
-        # pattern=locale.date_formats[format].pattern
-        # pattern = format
-
-        return eval("babeldates.format_%s" % part)(self.todatetime(tzinfo=True), format=format, locale=locale)
+        return _formatter(locale, part, format)(self.todatetime(tzinfo=True))
 
     def formatDate(self, locale=None, format='short'):
         """
@@ -543,17 +1103,15 @@ class DateTime(object):
     #############################################################################
 
     def __add__(self,other):
-        if isinstance(other,TimeDelta): return DateTime((self._mxObj+other._mxObj).strftime(self.isostr),self.timezone)
+        if isinstance(other,TimeDelta): return DateTime._fromMx(self._mxObj+other._mxObj,self.timezone)
         elif isinstance(other,RelativeDateTime): return other.__radd__(self)
         else: raise TypeError, "supports only TimeDelta and RelativeDateTime objects"
 
     def __sub__(self,other):
         if isinstance(other,TimeDelta):
-            return DateTime((self._mxObj-other._mxObj).strftime(self.isostr),self.timezone)
+            return DateTime._fromMx(self._mxObj-other._mxObj,self.timezone)
         elif isinstance(other,DateTime):
-            lo = self.toUTC()
-            ro = other.toUTC()
-            return TimeDelta(seconds=(lo._mxObj-ro._mxObj).seconds)
+            return TimeDelta(seconds=self.gmticks-other.gmticks)
         elif isinstance(other,RelativeDateTime):
             return other.__rsub__(self)
         else:
@@ -565,6 +1123,7 @@ class DateTime(object):
     #############################################################################
 
 class Date(DateTime):
+    __slots__ = ()
 
     def formatISO(self, offset=True, part="date"):
         return DateTime.formatISO(self, offset, part)
@@ -581,9 +1140,16 @@ class Date(DateTime):
 class TimeDelta(object):
     """
     @brief Class for managing Times and TimeDelta. (Wrapper for mxDateTimeDelta)
+           The duration is stored as integer microseconds, the mxDateTimeDelta
+           is built on demand (_mxObj)
     @param *args,**kwargs Can handle parsing strings, numbers and keywords.
             If args=None and kwargs=None defaults to now()
     """
+    __slots__ = ("_us",)
+
+    _keywords = { 'days': 86400000000, 'hours': 3600000000,
+                  'minutes': 60000000, 'seconds': 1000000 }
+
     def __init__(self,*args,**kwargs):
         """
         TimeDelta(seconds)
@@ -591,29 +1157,68 @@ class TimeDelta(object):
         TimeDelta("+DDd:hh:mm:ss")
         TimeDelta() -> now
         """
-        if len(args) == 1 and isinstance(args[0],(pydt.time)):
-            args = (args[0].isoformat(),)
-        if len(args) == 1 and isinstance(args[0],TimeDelta):
-            #from TimeDelta
-            args = (args[0]._mxObj,)
-        if len(args) == 0 and len(kwargs) == 0:
-            args=(mxdt.now().time,) # Default to now
+        if kwargs:
+            if args or [k for k in kwargs if not TimeDelta._keywords.has_key(k)]:
+                us = _mxMicroseconds(mxdt.DateTimeDeltaFrom(*args,**kwargs))
+            else:
+                us = int(round(sum([TimeDelta._keywords[k]*v for k, v in kwargs.items()])))
+        elif len(args) == 1:
+            value = args[0]
+            if isinstance(value,TimeDelta):
+                us = value._us
+            elif isinstance(value,(int,long,float)):
+                us = int(round(value*1000000))
+            elif isinstance(value,pydt.time):
+                us = ((value.hour*60 + value.minute)*60 + value.second)*1000000 + value.microsecond
+            elif isinstance(value,pydt.timedelta):
+                us = (value.days*86400 + value.seconds)*1000000 + value.microseconds
+            else:
+                us = _mxMicroseconds(mxdt.DateTimeDeltaFrom(value))
+        elif not args:
+            # Default to now
+            value = pydt.datetime.now()
+            us = ((value.hour*60 + value.minute)*60 + value.second)*1000000 + value.microsecond
+        elif len(args) <= 4 and not [a for a in args if not isinstance(a,(int,long,float))]:
+            # [days],[hours],[minutes],[seconds] as mxDateTimeDelta
+            days, hours, minutes, seconds = tuple(args) + (0,)*(4-len(args))
+            us = int(round((((days*24 + hours)*60 + minutes)*60 + seconds)*1000000))
+        else:
+            us = _mxMicroseconds(mxdt.DateTimeDeltaFrom(*args))
+
+        object.__setattr__(self,"_us",us)
 
-        self.__dict__["_mxObj"] = mxdt.DateTimeDeltaFrom(*args,**kwargs)
+    @classmethod
+    def _fromMicroseconds(cls,us):
+        """
+        @brief Hidden classmethod. Builds a TimeDelta straight from integer microseconds
+        """
+        obj = object.__new__(cls)
+        object.__setattr__(obj,"_us",us)
+        return obj
 
     def __setattr__(self,arg,value):
         raise AttributeError, "TimeDelta objects are read only"
 
+    @property
+    def _mxObj(self):
+        """
+        @brief Hidden property. The duration as mxDateTimeDelta
+        """
+        return mxdt.DateTimeDeltaFromSeconds(self._us/1e6)
+
     #############################################################################
 
     def __str__(self):
         sign = ''
-        if self.seconds < 0: sign = '-'
+        if self._us < 0: sign = '-'
         output = "%s" % sign
-        if self.day: output += "%02dd" % self.day
-        if self.day or self.hour: output += "%02d:" % self.hour
-        if self.day or self.hour or self.minute: output += "%02d:" % self.minute
-        return "%s%02d" % (output,self.second)
+        minutes, second = divmod(abs(self._us)//1000000, 60)
+        hours, minute = divmod(minutes, 60)
+        day, hour = divmod(hours, 24)
+        if day: output += "%02dd" % day
+        if day or hour: output += "%02d:" % hour
+        if day or hour or minute: output += "%02d:" % minute
+        return "%s%02d" % (output,second)
 
     def __repr__(self):
         return r"<%s('%s')>" % (self.__class__.__name__, self)
@@ -624,9 +1229,30 @@ class TimeDelta(object):
     def __int__(self):
         return int(self.__float__())
 
+    def __hash__(self):
+        return hash(self._us)
+
     #############################################################################
 
-    def __copy__(self): return copy.deepcopy(self)
+    # read only, copies are the object itself
+    def __copy__(self): return self
+    def __deepcopy__(self,memo): return self
+
+    # TimeDelta is pickled through copy_reg (see PICKLING),
+    # subclasses here, in the same compact form
+    def __reduce__(self):
+        return (_loadTimeDelta,(self.__class__,(_PICKLE_VERSION,self._us)))
+
+    def __setstate__(self,state):
+        """
+        @brief Restores pickles of subclasses holding the instance state: the
+               instance __dict__ of before __slots__ or the slots state
+        @param state dict, or tuple (None, dict of slots)
+        """
+        if isinstance(state,tuple): state = state[1]
+        if state.has_key("_us"): us = state["_us"]
+        else: us = _mxMicroseconds(state["_mxObj"])
+        object.__setattr__(self,"_us",us)
 
     #############################################################################
     @classmethod
@@ -641,29 +1267,39 @@ class TimeDelta(object):
 
     #############################################################################
 
-    def tuple(self): return self._mxObj.tuple()
+    def tuple(self):
+        """
+        @brief (days, hours, minutes, seconds), all with the sign of the duration
+        """
+        sign = 1
+        if self._us < 0: sign = -1
+        minutes, us = divmod(abs(self._us), 60000000)
+        hours, minute = divmod(minutes, 60)
+        day, hour = divmod(hours, 24)
+        return (sign*day, sign*hour, sign*minute, sign*us/1e6)
 
     @property
-    def second(self): return abs(self._mxObj.second)
+    def second(self): return (abs(self._us) % 60000000)/1e6
     @property
-    def minute(self): return abs(self._mxObj.minute)
+    def minute(self): return abs(self._us)//60000000 % 60
     @property
-    def hour(self): return abs(self._mxObj.hour)
+    def hour(self): return abs(self._us)//3600000000 % 24
     @property
-    def day(self): return abs(self._mxObj.day)
+    def day(self): return abs(self._us)//86400000000
     @property
-    def seconds(self): return self._mxObj.seconds
+    def seconds(self): return self._us/1e6
     @property
-    def minutes(self): return self._mxObj.minutes
+    def minutes(self): return self._us/6e7
     @property
-    def hours(self): return self._mxObj.hours
+    def hours(self): return self._us/3.6e9
     @property
-    def days(self): return self._mxObj.days
+    def days(self): return self._us/8.64e10
 
     #############################################################################
 
     def totime(self):
-        return pydt.time(*self.tuple()[1:])
+        us = abs(self._us)
+        return pydt.time(self.hour, self.minute, us//1000000 % 60, us % 1000000)
 
     #############################################################################
 
@@ -680,7 +1316,7 @@ class TimeDelta(object):
         @brief Format as ISO (hh:mm:ss)
         @return string
         """
-        return "%s" % (self.strftime("%H:%M:%S"))
+        return "%02d:%02d:%02d" % (self.hour, self.minute, abs(self._us)//1000000 % 60)
 
     def _formatTimeObj(self, locale, format):
         """
@@ -689,8 +1325,7 @@ class TimeDelta(object):
         @param format can be 'short', 'medium', 'long', 'full'
         """
         if not locale: locale = makeLocale()
-        part = "time"
-        return eval("babeldates.format_%s" % part)(self.totime(), format=format, locale=locale)
+        return _formatter(locale, 'time', format)(self.totime())
 
     def formatTime(self, locale=None, format='medium'):
         """
@@ -704,7 +1339,7 @@ class TimeDelta(object):
     #############################################################################
 
     def __eq__(self, other): # X == Y
-        if isinstance(other,TimeDelta): return self._mxObj == other._mxObj
+        if isinstance(other,TimeDelta): return self._us == other._us
         return False
         # elif other is None or str(type(u))==str(util.symbol): return False
         # else:
@@ -714,47 +1349,46 @@ class TimeDelta(object):
         return not(self.__eq__(other))
 
     def __neg__(self): # -X
-        selfcopy = copy.deepcopy(self)
-        selfcopy.__dict__['_mxObj'] = -selfcopy._mxObj
-        return selfcopy
+        return TimeDelta._fromMicroseconds(-self._us)
 
     def __lt__(self, other): # X < Y
         if other is None: return False
-        if isinstance(other,TimeDelta): return self._mxObj < other._mxObj
+        if isinstance(other,TimeDelta): return self._us < other._us
         else: raise TypeError, "supports only TimeDelta objects"
 
     def __le__(self, other): # X <= Y
         if other is None: return False
-        if isinstance(other,TimeDelta): return self._mxObj <= other._mxObj
+        if isinstance(other,TimeDelta): return self._us <= other._us
         else: raise TypeError, "supports only TimeDelta objects"
 
     def __gt__(self, other): # X > Y  
         if other is None: return False
-        if isinstance(other,TimeDelta): return self._mxObj >= other._mxObj
+        if isinstance(other,TimeDelta): return self._us > other._us
         else: raise TypeError, "supports only TimeDelta objects"
 
     def __ge__(self, other): # X >= Y
         if other is None: return False
-        if isinstance(other,TimeDelta): return self._mxObj >= other._mxObj
+        if isinstance(other,TimeDelta): return self._us >= other._us
         else: raise TypeError, "supports only TimeDelta objects"
 
     #############################################################################
 
     def __add__(self,other):
-        if isinstance(other,TimeDelta): return TimeDelta(self._mxObj+other._mxObj)
+        if isinstance(other,TimeDelta): return TimeDelta._fromMicroseconds(self._us+other._us)
         else: raise TypeError, "supports only TimeDelta objects"
 
     def __sub__(self,other):
-        if isinstance(other,TimeDelta): return TimeDelta(self._mxObj-other._mxObj)
+        if isinstance(other,TimeDelta): return TimeDelta._fromMicroseconds(self._us-other._us)
         else: raise TypeError, "supports only TimeDelta objects"
 
     def __mul__(self,other):
-        if isinstance(other,(int,float)): return TimeDelta(self._mxObj*float(other))
+        if isinstance(other,(int,long)): return TimeDelta._fromMicroseconds(self._us*other)
+        elif isinstance(other,float): return TimeDelta._fromMicroseconds(int(round(self._us*other)))
         else: raise TypeError, "supports only numbers"
     __rmul__ = __mul__
 
     def __div__(self,other):
-        if isinstance(other,(int,float)): return self.__mul__(1/float(other))
+        if isinstance(other,(int,long,float)): return TimeDelta._fromMicroseconds(int(round(self._us/float(other))))
         else: raise TypeError, "supports only numbers"
     __rdiv__ = __div__
 
@@ -773,13 +1407,15 @@ class RelativeDateTime(object):
     @brief Class for managing Times and TimeDelta. (Wrapper for mxDateTimeDelta)
     @param *args,**kwargs Can handle parsing strings, numbers and keywords.
     """
+    __slots__ = ("_mxObj",)
+
     def __init__(self,*args,**kwargs):
         """ RelativeDateTime([years],[months],[days],[hours],[minutes],[seconds],
                              [year],[month],[day],[hour],[minute],[second],[weekday])
             RelativeDateTime("YYYY-MM-DD HH:MM:SS") # absolutes
             RelativeDateTime("(+YYYY)-(+MM)-(+DD) (+HH):(+MM):(+SS)") # relatives
         """
-        self.__dict__["_mxObj"] = mxdt.RelativeDateTimeFrom(*args,**kwargs)
+        object.__setattr__(self,"_mxObj",mxdt.RelativeDateTimeFrom(*args,**kwargs))
 
     def __setattr__(self,arg,value):
         raise AttributeError, "RelativeDateTime objects are read only"
@@ -794,22 +1430,59 @@ class RelativeDateTime(object):
 
     #############################################################################
 
-    def __copy__(self): return self.__deepcopy__(None)
-    def __deepcopy__(self,memo):
+    @classmethod
+    def _fromMx(cls,mxObj):
+        """
+        @brief Hidden classmethod. Wraps a mx RelativeDateTime
+        @param mxObj mx RelativeDateTime object
+        @return RelativeDateTime object
+        """
+        obj = object.__new__(cls)
+        object.__setattr__(obj,"_mxObj",mxObj)
+        return obj
+
+    # relative fields (scaled by * and /) and absolute fields
+    _relativeFields = ("years","months","days","hours","minutes","seconds")
+    _absoluteFields = ("year","month","day","hour","minute","second","weekday")
+
+    # (key, factor type, factor) -> RelativeDateTime, see __mul__
+    _products = LRUCache(maxsize=1024)
+
+    @property
+    def _key(self):
+        """
+        @brief Hidden property. Normalized, hashable form: tuple of the
+               relative fields followed by the absolute fields
+        """
         o = self._mxObj
-        return RelativeDateTime(years=o.years,
-                                months=o.months,
-                                days=o.days,
-                                year=o.year,
-                                month=o.month,
-                                day=o.day,
-                                hours=o.hours,
-                                minutes=o.minutes,
-                                seconds=o.seconds,
-                                hour=o.hour,
-                                minute=o.minute,
-                                second=o.second,
-                                weekday=o.weekday)
+        return (o.years, o.months, o.days, o.hours, o.minutes, o.seconds,
+                o.year, o.month, o.day, o.hour, o.minute, o.second, o.weekday)
+
+    @classmethod
+    def _fromKey(cls,key):
+        """
+        @brief Hidden classmethod. Builds a RelativeDateTime from its _key
+        """
+        fields = dict(zip(cls._relativeFields + cls._absoluteFields, key))
+        return cls._fromMx(mxdt.RelativeDateTime(**fields))
+
+    # read only, copies are the object itself
+    def __copy__(self): return self
+    def __deepcopy__(self,memo): return self
+
+    # RelativeDateTime is pickled through copy_reg (see PICKLING),
+    # subclasses here, by their _key
+    def __reduce__(self):
+        return (_loadRelativeDateTime,(self.__class__,self._key))
+
+    def __setstate__(self,state):
+        """
+        @brief Restores pickles of subclasses holding the instance state: the
+               instance __dict__ of before __slots__ or the slots state
+        @param state dict, or tuple (None, dict of slots)
+        """
+        if isinstance(state,tuple): state = state[1]
+        object.__setattr__(self,"_mxObj",state["_mxObj"])
 
     #############################################################################
 
@@ -845,56 +1518,57 @@ class RelativeDateTime(object):
     #############################################################################
 
     def __eq__(self, other): # X == Y
-        if isinstance(other,RelativeDateTime): return self._mxObj == other._mxObj
+        if isinstance(other,RelativeDateTime): return self._key == other._key
         else: raise TypeError, "supports only RelativeDateTime objects"
 
+    def __hash__(self):
+        return hash(self._key)
+
     def __ne__(self, other): # X != Y
         return not(self.__eq__(other))
 
     def __neg__(self): # - X
-        selfcopy = copy.deepcopy(self)
-        selfcopy.__dict__['_mxObj'] = -selfcopy._mxObj
-        return selfcopy
+        return RelativeDateTime._fromMx(-self._mxObj)
 
     #############################################################################
 
     def __add__(self,other):
-        if isinstance(other,RelativeDateTime): return RelativeDateTime(self._mxObj+other._mxObj)
+        if isinstance(other,RelativeDateTime): return RelativeDateTime._fromMx(self._mxObj+other._mxObj)
         else: raise TypeError, "supports only RelativeDateTime objects"
 
     def __radd__(self,other):
-        if isinstance(other,DateTime): return DateTime(other._mxObj+self._mxObj,other.timezone)
+        if isinstance(other,DateTime): return DateTime._fromMx(other._mxObj+self._mxObj,other.timezone)
         else: raise TypeError, "supports only DateTime objects"
 
     def __sub__(self,other):
-        if isinstance(other,RelativeDateTime): return RelativeDateTime(self._mxObj-other._mxObj)
+        if isinstance(other,RelativeDateTime): return RelativeDateTime._fromMx(self._mxObj-other._mxObj)
         else: raise TypeError, "supports only RelativeDateTime objects"
 
     def __rsub__(self,other):
-        if isinstance(other,DateTime): return DateTime(other._mxObj-self._mxObj,other.timezone)
+        if isinstance(other,DateTime): return DateTime._fromMx(other._mxObj-self._mxObj,other.timezone)
         else: raise TypeError, "supports only DateTime objects"
 
     def __mul__(self,other):
-        if isinstance(other,(int,float)):
+        if isinstance(other,(int,long,float)):
             #rewritten beacuse in original mx, X+X != X*2
-            factor = float(other)
-            selfcopy = copy.deepcopy(self)
-            # date deltas
-            r = selfcopy._mxObj
-            r.years = factor * r.years
-            r.months = factor * r.months
-            r.days = factor * r.days
-            # time deltas
-            r.hours = factor * r.hours
-            r.minutes = factor * r.minutes
-            r.seconds = factor * r.seconds
-            return selfcopy
+            # integer factors keep integer fields (DateTime.range)
+            if isinstance(other,(int,long)): factor = other
+            else: factor = float(other)
+            key = self._key
+            cacheKey = (key, factor.__class__, factor)
+            product = RelativeDateTime._products.get(cacheKey)
+            if product is None:
+                # scale the relative fields, keep the absolute ones
+                scaled = tuple([factor * v for v in key[:6]]) + key[6:]
+                product = RelativeDateTime._fromKey(scaled)
+                RelativeDateTime._products[cacheKey] = product
+            return product
         else: raise TypeError, "supports only numbers"
 
     __rmul__ = __mul__
 
     def __div__(self,other):
-        if isinstance(other,(int,float)): return self.__mul__(1/float(other))
+        if isinstance(other,(int,long,float)): return self.__mul__(1/float(other))
         else: raise TypeError, "supports only numbers"
 
     __rdiv__ = __div__
@@ -920,12 +1594,975 @@ oneSecond = RelativeDateTime(seconds=1)
 #############################################################################
 #############################################################################
 
+# -- Calendar periods
+
+def iter_periods(start, end, unit):
+    """
+    @brief Generator of the calendar periods overlapping [start, end],
+           in the TimeZone of start
+    @param start DateTime object
+    @param end DateTime object
+    @param unit 'year', 'month', 'week' (starting on monday) or 'day'
+    @return generator of tuples (start, end) of DateTime objects, as monthBoundary,
+            nothing if end is before start
+
+    The month of the start of DST in Rome
+
+    >>> tz = TimeZone('Europe/Rome')
+    >>> [(str(a), b.info()) for a, b in iter_months(DateTime(2011,3,15,0,0,0,tz), DateTime(2011,4,1,0,0,0,tz))]
+    [('2011-03-01T00:00:00 Europe/Rome', '2011-03-31T23:59:59+02:00 CEST (Europe/Rome)'), ('2011-04-01T00:00:00 Europe/Rome', '2011-04-30T23:59:59+02:00 CEST (Europe/Rome)')]
+    >>> [b.gmticks - a.gmticks + 1 for a, b in iter_periods(DateTime(2011,3,26,0,0,0,tz), DateTime(2011,3,27,0,0,0,tz), 'day')]
+    [86400.0, 82800.0]
+    >>> list(iter_periods(DateTime(2011,3,27,12,0,0,tz), DateTime(2011,3,27,0,0,0,tz), 'day'))
+    []
+    >>> len(list(iter_periods(DateTime(2011,3,27,12,0,0,tz), DateTime(2011,3,27,12,0,0,tz), 'day')))
+    1
+    """
+    timezone = start.timezone
+    endticks = end.gmticks
+    if start.gmticks > endticks: return
+    first, last = _mxBounds(start._mxObj,unit)
+    while True:
+        period = (DateTime._fromMx(first,timezone), DateTime._fromMx(last,timezone))
+        if period[0].gmticks > endticks: break
+        yield period
+        first, last = _mxBounds(mxdt.DateTimeFromAbsDateTime(last.absdate+1,0),unit)
+
+def iter_months(start, end):
+    """
+    @brief Generator of the months overlapping [start, end], see iter_periods
+    """
+    return iter_periods(start, end, 'month')
+
+def iter_weeks(start, end):
+    """
+    @brief Generator of the weeks (from monday) overlapping [start, end], see iter_periods
+    """
+    return iter_periods(start, end, 'week')
+
+def bucket(dts, unit='month', tz=None):
+    """
+    @brief Groups DateTimes by calendar period
+    @param dts iterable of DateTime objects
+    @param unit 'year', 'month', 'week' (starting on monday) or 'day'
+    @param tz TimeZone of the calendar (default TimeZone of the first DateTime)
+    @return list of tuples (start of period as DateTime, list of DateTime objects), sorted by start
+
+    Instants around the start of DST, by day of Rome
+
+    >>> dts = [DateTime(2011,3,26,22,30,0), DateTime(2011,3,26,23,30,0), DateTime(2011,3,27,22,30,0)]
+    >>> [(str(start), len(values)) for start, values in bucket(dts, 'day', TimeZone('Europe/Rome'))]
+    [('2011-03-26T00:00:00 Europe/Rome', 1), ('2011-03-27T00:00:00 Europe/Rome', 1), ('2011-03-28T00:00:00 Europe/Rome', 1)]
+    """
+    buckets = {}
+    for dt in dts:
+        if tz is None: tz = dt.timezone
+        start = _mxBounds(dt.toTZ(tz)._mxObj,unit)[0]
+        key = start.absdate
+        if not buckets.has_key(key): buckets[key] = (DateTime._fromMx(start,tz), [])
+        buckets[key][1].append(dt)
+    return [buckets[k] for k in sorted(buckets.keys())]
+
+#############################################################################
+#############################################################################
+#############################################################################
+
+# -- Recurrences
+
+class RecurrenceRule(object):
+    """
+    @brief Recurrence rule (RFC 5545 RRULE subset: FREQ, INTERVAL, BYDAY,
+           BYMONTHDAY, COUNT, UNTIL), weeks start on monday.
+           Occurrences keep the wall time of dtstart in its TimeZone,
+           instants follow the DST changes of the TimeZone.
+           BYDAY takes weekdays only (no ordinals as 1MO or -1FR).
+    @param dtstart DateTime object, first possible occurrence
+    @param freq 'DAILY', 'WEEKLY', 'MONTHLY' or 'YEARLY'
+    @param interval number of periods between two periods with occurrences
+    @param byday list of weekdays ('MO', 'TU', ... or 0 for monday ... 6)
+    @param bymonthday list of days of month (1 to 31, -1 for the last day ...)
+    @param count maximum number of occurrences
+    @param until DateTime object, last possible occurrence (included)
+
+    Example:
+        rule = RecurrenceRule.fromString("FREQ=MONTHLY;BYDAY=MO,FR;COUNT=10", DateTime())
+        rule.after(DateTime()) -> next occurrence as DateTime
+        list(rule) -> the 10 occurrences as DateTime objects
+
+    Week ends around the start of DST in Rome
+
+    >>> tz = TimeZone('Europe/Rome')
+    >>> rule = RecurrenceRule.fromString("FREQ=WEEKLY;BYDAY=SA,SU;COUNT=4", DateTime(2011,3,19,9,0,0,tz))
+    >>> for d in rule: print d.info()
+    2011-03-19T09:00:00+01:00 CET (Europe/Rome)
+    2011-03-20T09:00:00+01:00 CET (Europe/Rome)
+    2011-03-26T09:00:00+01:00 CET (Europe/Rome)
+    2011-03-27T09:00:00+02:00 CEST (Europe/Rome)
+    >>> rule.after(DateTime(2011,3,26,12,0,0,tz))
+    <DateTime('2011-03-27T09:00:00 Europe/Rome')>
+    >>> print rule.after(DateTime(2011,3,27,12,0,0,tz))
+    None
+    >>> print ", ".join(rule.toArray().formatISO())
+    2011-03-19T09:00:00+01:00, 2011-03-20T09:00:00+01:00, 2011-03-26T09:00:00+01:00, 2011-03-27T09:00:00+02:00
+
+    Last day of every other month
+
+    >>> rule = RecurrenceRule.fromString("RRULE:FREQ=MONTHLY;INTERVAL=2;BYMONTHDAY=-1;UNTIL=20110630", DateTime(2011,1,1,0,0,0,tz))
+    >>> [str(d) for d in rule]
+    ['2011-01-31T00:00:00 Europe/Rome', '2011-03-31T00:00:00 Europe/Rome', '2011-05-31T00:00:00 Europe/Rome']
+
+    Mondays every third day: the count of occurrences repeats every 7 periods
+
+    >>> rule = RecurrenceRule.fromString("FREQ=DAILY;INTERVAL=3;BYDAY=MO;COUNT=3", DateTime(2011,3,21,9,0,0,tz))
+    >>> rule.after(DateTime(2011,4,1,0,0,0,tz)), rule.after(DateTime(2011,5,2,9,0,0,tz))
+    (<DateTime('2011-04-11T09:00:00 Europe/Rome')>, None)
+    >>> list(RecurrenceRule.fromString("FREQ=DAILY;INTERVAL=7;BYDAY=MO", DateTime(2011,3,22,9,0,0,tz)))
+    []
+    """
+
+    frequencies = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+    weekdays = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+    # days (for DAILY and WEEKLY), months and years of the 400 years gregorian cycle
+    _cycles = { "DAILY": 146097, "WEEKLY": 146097 // 7, "MONTHLY": 4800, "YEARLY": 400 }
+
+    def __init__(self, dtstart, freq, interval=1, byday=None, bymonthday=None, count=None, until=None):
+        freq = freq.upper()
+        if freq not in RecurrenceRule.frequencies:
+            raise ValueError, "unsupported FREQ '%s', use one of %s" % (freq, ", ".join(RecurrenceRule.frequencies))
+        if interval < 1: raise ValueError, "INTERVAL must be positive"
+        if count is not None and until is not None: raise ValueError, "COUNT and UNTIL are exclusive"
+        self.dtstart = dtstart
+        self.timezone = dtstart.timezone
+        self.freq = freq
+        self.interval = int(interval)
+        self.byday = byday and sorted(set([RecurrenceRule._weekday(d) for d in byday])) or None
+        self.bymonthday = bymonthday and sorted(set([int(d) for d in bymonthday])) or None
+        for d in self.bymonthday or ():
+            if not (1 <= abs(d) <= 31): raise ValueError, "invalid BYMONTHDAY %s" % d
+        self.count = count
+        self.until = until
+
+        start = dtstart._mxObj
+        self._startday = start.absdate
+        self._time = start.abstime
+        self._untilwall = None
+        if until is not None: self._untilwall = until.toTZ(self.timezone)._wallticks
+        cycle = self._patternCycle()
+        self._cycle = cycle // _gcd(self.interval, cycle)
+        self._prefix = None # occurrences before each period of a cycle, see _before
+        # occurrences of period 0 before dtstart
+        self._skipped = len([d for d in self._days(0) if d < self._startday])
+
+    def _patternCycle(self):
+        """
+        @brief Hidden function. Periods (of interval 1) after which the number of
+               days per period repeats: the 400 years gregorian cycle when BY*
+               follow the calendar, a week for BYDAY alone on days, else 1
+        """
+        if self.bymonthday:
+            days = self.bymonthday # sorted
+            # MONTHLY on days present in every month, never twice the same day
+            if self.freq == "MONTHLY" and not self.byday and (1 <= days[0] and days[-1] <= 28 or
+                                                              -28 <= days[0] and days[-1] <= -1):
+                return 1
+            return RecurrenceRule._cycles[self.freq]
+        if self.freq == "DAILY": return self.byday and 7 or 1
+        if self.freq == "WEEKLY": return 1
+        if self.freq == "MONTHLY":
+            if self.byday or pydt.date.fromordinal(self._startday).day > 28: return RecurrenceRule._cycles[self.freq]
+            return 1
+        return RecurrenceRule._cycles[self.freq]
+
+    @classmethod
+    def _weekday(cls, day):
+        if isinstance(day, (int, long)):
+            if 0 <= day <= 6: return day
+        elif day.upper() in cls.weekdays:
+            return list(cls.weekdays).index(day.upper())
+        raise ValueError, "invalid BYDAY '%s'" % day
+
+    @classmethod
+    def fromString(cls, string, dtstart):
+        """
+        @brief Classmethod to parse an RRULE string
+        @param string rule as "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20121231T235959Z"
+               (the "RRULE:" prefix is optional, a date only UNTIL includes its whole day)
+        @param dtstart DateTime object, first possible occurrence
+        @return RecurrenceRule object
+        """
+        if string.upper().startswith("RRULE:"): string = string[6:]
+        params = {}
+        for part in string.strip().split(";"):
+            if not part: continue
+            try:
+                name, value = part.split("=", 1)
+            except ValueError:
+                raise ValueError, "invalid RRULE part '%s'" % part
+            params[name.strip().upper()] = value.strip()
+        if not params.has_key("FREQ"): raise ValueError, "RRULE without FREQ"
+        unsupported = [p for p in params if p not in ("FREQ", "INTERVAL", "BYDAY", "BYMONTHDAY", "COUNT", "UNTIL", "WKST")]
+        if unsupported: raise ValueError, "unsupported RRULE parts %s" % ", ".join(unsupported)
+        if params.get("WKST", "MO").upper() != "MO": raise ValueError, "only WKST=MO is supported"
+
+        kwargs = { 'interval': int(params.get("INTERVAL", 1)) }
+        if params.has_key("BYDAY"): kwargs['byday'] = params["BYDAY"].split(",")
+        if params.has_key("BYMONTHDAY"): kwargs['bymonthday'] = [int(d) for d in params["BYMONTHDAY"].split(",")]
+        if params.has_key("COUNT"): kwargs['count'] = int(params["COUNT"])
+        if params.has_key("UNTIL"): kwargs['until'] = cls._parseUntil(params["UNTIL"], dtstart.timezone)
+        return cls(dtstart, params["FREQ"], **kwargs)
+
+    @classmethod
+    def _parseUntil(cls, value, timezone):
+        value = value.upper()
+        try:
+            if value.endswith("Z"):
+                t = pydt.datetime.strptime(value, "%Y%m%dT%H%M%SZ")
+                timezone = TimeZone()
+            elif "T" in value:
+                t = pydt.datetime.strptime(value, "%Y%m%dT%H%M%S")
+            else:
+                t = pydt.datetime.strptime(value, "%Y%m%d").replace(hour=23, minute=59, second=59)
+        except ValueError:
+            raise ValueError, "invalid UNTIL '%s'" % value
+        return DateTime._fromMx(mxdt.DateTime(t.year, t.month, t.day, t.hour, t.minute, t.second), timezone)
+
+    def __str__(self):
+        parts = ["FREQ=%s" % self.freq]
+        if self.interval != 1: parts.append("INTERVAL=%d" % self.interval)
+        if self.byday: parts.append("BYDAY=%s" % ",".join([RecurrenceRule.weekdays[d] for d in self.byday]))
+        if self.bymonthday: parts.append("BYMONTHDAY=%s" % ",".join([str(d) for d in self.bymonthday]))
+        if self.count is not None: parts.append("COUNT=%d" % self.count)
+        if self.until is not None: parts.append("UNTIL=%s" % self.until.toUTC().strftime("%Y%m%dT%H%M%SZ"))
+        return ";".join(parts)
+
+    def __repr__(self):
+        return r"<%s('%s' from '%s')>" % (self.__class__.__name__, self, self.dtstart)
+
+    #############################################################################
+
+    # Days are absolute dates (ordinals, 0001-01-01 is 1 and a monday)
+
+    def _monthDays(self, year, month):
+        """
+        @brief Hidden function. Days of a month matching BYMONTHDAY and BYDAY
+        """
+        first = pydt.date(year, month, 1).toordinal()
+        if month == 12: length = pydt.date(year+1, 1, 1).toordinal() - first
+        else: length = pydt.date(year, month+1, 1).toordinal() - first
+        if self.bymonthday:
+            days = sorted(set([first + (d-1 if d > 0 else length+d) for d in self.bymonthday if abs(d) <= length]))
+        elif self.byday:
+            days = range(first, first+length)
+        else:
+            # MONTHLY on the day of dtstart
+            day = pydt.date.fromordinal(self._startday).day
+            days = day <= length and [first + day - 1] or []
+        if self.byday:
+            days = [d for d in days if (d-1) % 7 in self.byday]
+        return days
+
+    def _match(self, day):
+        """
+        @brief Hidden function. True if day matches BYMONTHDAY and BYDAY
+        """
+        if self.byday and (day-1) % 7 not in self.byday: return False
+        if self.bymonthday:
+            date = pydt.date.fromordinal(day)
+            return day in self._monthDays(date.year, date.month)
+        return True
+
+    def _days(self, period):
+        """
+        @brief Hidden function. Sorted days of a period (0 is the period of dtstart)
+        """
+        if self.freq == "DAILY":
+            day = self._startday + period*self.interval
+            return self._match(day) and [day] or []
+        if self.freq == "WEEKLY":
+            week = self._startday - (self._startday-1) % 7 + period*7*self.interval
+            weekdays = self.byday or [(self._startday-1) % 7]
+            return [week + d for d in weekdays if not self.bymonthday or self._match(week + d)]
+        start = pydt.date.fromordinal(self._startday)
+        if self.freq == "MONTHLY":
+            year, month = divmod(start.year*12 + start.month-1 + period*self.interval, 12)
+            return self._monthDays(year, month+1)
+        year = start.year + period*self.interval
+        if self.byday or self.bymonthday:
+            days = []
+            for month in range(1, 13): days.extend(self._monthDays(year, month))
+            return days
+        try:
+            return [pydt.date(year, start.month, start.day).toordinal()]
+        except ValueError: # february 29th
+            return []
+
+    def _period(self, day):
+        """
+        @brief Hidden function. Period containing a day (negative before dtstart)
+        """
+        if self.freq == "DAILY":
+            return (day - self._startday) // self.interval
+        if self.freq == "WEEKLY":
+            return ((day - (day-1) % 7) - (self._startday - (self._startday-1) % 7)) // (7*self.interval)
+        date, start = pydt.date.fromordinal(day), pydt.date.fromordinal(self._startday)
+        if self.freq == "MONTHLY":
+            return ((date.year - start.year)*12 + date.month - start.month) // self.interval
+        return (date.year - start.year) // self.interval
+
+    def _before(self, period):
+        """
+        @brief Hidden function. Number of days in the periods before period
+               (dtstart excluded), from the counts of one cycle of periods
+        """
+        if self._prefix is None:
+            prefix = [0]
+            for p in xrange(self._cycle):
+                prefix.append(prefix[-1] + len(self._days(p)))
+            self._prefix = prefix
+        cycles, period = divmod(period, self._cycle)
+        return cycles*self._prefix[-1] + self._prefix[period]
+
+    def _walk(self, period=0, index=None):
+        """
+        @brief Hidden generator of the occurrence days from period, COUNT and UNTIL applied
+        @param period first period
+        @param index number of occurrences before period (computed if None)
+        """
+        if self.count is not None and index is None:
+            index = 0
+            if period > 0: index = self._before(period) - self._skipped
+        empty = 0
+        while empty < self._cycle:
+            days = self._days(period)
+            # a cycle of empty periods repeats forever (before filtering period 0)
+            if not days: empty += 1
+            else: empty = 0
+            if period == 0: days = [d for d in days if d >= self._startday]
+            for day in days:
+                if self.count is not None:
+                    if index >= self.count: return
+                    index += 1
+                if self._untilwall is not None and self._wall(day) > self._untilwall: return
+                yield day
+            period += 1
+
+    def _wall(self, day):
+        return (day - _EPOCH_ABSDATE)*86400 + self._time
+
+    def _occurrence(self, day):
+        return DateTime._fromMx(mxdt.DateTimeFromAbsDateTime(day, self._time), self.timezone)
+
+    #############################################################################
+
+    def __iter__(self):
+        """
+        @brief Lazily yields the occurrences as DateTime objects
+        """
+        for day in self._walk():
+            yield self._occurrence(day)
+
+    def after(self, dt, inc=False):
+        """
+        @brief First occurrence after dt, without iterating from dtstart
+        @param dt DateTime object
+        @param inc True to return dt itself if it is an occurrence
+        @return DateTime object or None
+        """
+        ticks = dt.gmticks
+        period = max(self._period(dt.toTZ(self.timezone)._mxObj.absdate), 0)
+        for day in self._walk(period):
+            occurrence = self._occurrence(day)
+            if occurrence.gmticks > ticks or (inc and occurrence.gmticks == ticks):
+                return occurrence
+        return None
+
+    def toArray(self, limit=None):
+        """
+        @brief All the occurrences (at most limit) as DateTimeArray (epoch seconds)
+        @param limit maximum number of occurrences, required without COUNT and UNTIL
+        @return DateTimeArray object. Needs numpy
+        """
+        if numpy is None:
+            raise ImportError, "DateTimeArray needs numpy"
+        if limit is None and self.count is None and self.until is None:
+            raise ValueError, "unbounded rule, use COUNT, UNTIL or limit"
+        days = []
+        for day in self._walk():
+            if limit is not None and len(days) >= limit: break
+            days.append(day)
+        wall = (numpy.array(days, dtype=numpy.int64) - _EPOCH_ABSDATE)*86400 + int(self._time)
+        return DateTimeArray._fromWall(wall, self.timezone)
+
+#############################################################################
+#############################################################################
+#############################################################################
+
+# -- Interval index
+
+def _ticks(value):
+    """
+    @brief Hidden function. UTC epoch of a DateTime (numbers are taken as epochs)
+    """
+    if isinstance(value,DateTime): return value.gmticks
+    return value
+
+class IntervalIndex(object):
+    """
+    @brief Index of closed intervals [start, end] of DateTimes, keyed on UTC epoch,
+           for stabbing ("which intervals contain this instant") and overlap queries.
+           Entries are kept sorted by start in blocks, each block knows its
+           greatest end: queries only scan the blocks that can match.
+    @param intervals iterable of (start, end) or (start, end, value), bulk loaded
+
+    Example:
+        index = IntervalIndex([(start, end, booking) for booking in bookings])
+        handle = index.insert(start, end, booking)
+        index.stab(DateTime()) -> bookings containing now
+        index.overlap(start, end) -> bookings overlapping [start, end]
+        index.delete(handle)
+
+    Around the start of DST in Rome (01:00 UTC, 02:00 CET becomes 03:00 CEST)
+
+    >>> tz = TimeZone('Europe/Rome')
+    >>> index = IntervalIndex([(DateTime(2011,3,27,1,0,0,tz), DateTime(2011,3,27,1,59,0,tz), 'before'),
+    ...                        (DateTime(2011,3,27,3,0,0,tz), DateTime(2011,3,27,4,0,0,tz), 'after')])
+    >>> index.stab(DateTime(2011,3,27,1,30,0))
+    ['after']
+    >>> index.overlap(DateTime(2011,3,27,1,30,0,tz), DateTime(2011,3,27,3,30,0,tz))
+    ['before', 'after']
+    >>> handle = index.insert(DateTime(2011,3,26,23,0,0,tz), DateTime(2011,3,27,7,0,0,tz), 'night')
+    >>> index.stab(DateTime(2011,3,27,0,30,0,tz)), len(index)
+    (['night'], 3)
+    >>> index.delete(handle)
+    >>> index.stab(DateTime(2011,3,27,0,30,0,tz)), len(index)
+    ([], 2)
+    >>> IntervalIndex.fromArrays(DateTimeArray([0, 100], tz), DateTimeArray([50, 200], tz)).stab(120)
+    [(100, 200)]
+    """
+
+    _blocksize = 512
+
+    def __init__(self,intervals=()):
+        entries = []
+        values = {}
+        for seq, interval in enumerate(intervals):
+            start, end = _ticks(interval[0]), _ticks(interval[1])
+            if start > end: raise ValueError, "interval ends before its start"
+            entries.append((start,end,seq))
+            if len(interval) > 2: values[seq] = interval[2]
+            else: values[seq] = (interval[0],interval[1])
+        self._load(entries,values)
+
+    @classmethod
+    def fromArrays(cls,starts,ends,values=None):
+        """
+        @brief Classmethod to bulk load intervals from two DateTimeArray objects
+        @param starts DateTimeArray object
+        @param ends DateTimeArray object
+        @param values list of values (default (start, end) epoch pairs)
+        @return IntervalIndex object
+        """
+        if len(starts) != len(ends): raise ValueError, "starts and ends differ in length"
+        if (starts.epochs > ends.epochs).any(): raise ValueError, "interval ends before its start"
+        startList, endList = starts.epochs.tolist(), ends.epochs.tolist()
+        entries = zip(startList, endList, xrange(len(startList)))
+        if values is None: values = zip(startList, endList)
+        index = cls()
+        index._load(entries, dict(enumerate(values)))
+        return index
+
+    def _load(self,entries,values):
+        """
+        @brief Hidden function. Builds the blocks from (start, end, seq) entries
+        """
+        entries.sort()
+        size = self._blocksize
+        self._blocks = [entries[i:i+size] for i in xrange(0,len(entries),size)]
+        self._mins = [block[0][0] for block in self._blocks]
+        self._maxEnds = [max([e[1] for e in block]) for block in self._blocks]
+        # upper bound of the interval lengths, queries start at (start - _maxLength)
+        self._maxLength = max([e[1]-e[0] for e in entries] or [0])
+        self._values = values
+        self._seq = len(entries) and max([e[2] for e in entries]) + 1 or 0
+        self._len = len(entries)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        """
+        @brief Yields the values, sorted by start
+        """
+        for block in self._blocks:
+            for entry in block:
+                yield self._values[entry[2]]
+
+    def __repr__(self):
+        return r"<%s(%d intervals)>" % (self.__class__.__name__, self._len)
+
+    #############################################################################
+
+    def insert(self,start,end,value=None):
+        """
+        @brief Adds an interval
+        @param start DateTime object
+        @param end DateTime object
+        @param value returned by queries (default (start, end))
+        @return handle for delete
+        """
+        ticks = (_ticks(start), _ticks(end))
+        if ticks[0] > ticks[1]: raise ValueError, "interval ends before its start"
+        entry = (ticks[0], ticks[1], self._seq)
+        self._seq += 1
+        if value is None: value = (start,end)
+        self._values[entry[2]] = value
+        self._len += 1
+        self._maxLength = max(self._maxLength, entry[1]-entry[0])
+
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._mins.append(entry[0])
+            self._maxEnds.append(entry[1])
+            return entry
+        i = max(bisect_right(self._mins,entry[0]) - 1, 0)
+        block = self._blocks[i]
+        insort(block,entry)
+        self._mins[i] = block[0][0]
+        self._maxEnds[i] = max(self._maxEnds[i],entry[1])
+        if len(block) > 2*self._blocksize:
+            half = len(block) // 2
+            self._blocks[i:i+1] = [block[:half], block[half:]]
+            self._mins[i:i+1] = [block[0][0], block[half][0]]
+            self._maxEnds[i:i+1] = [max([e[1] for e in block[:half]]), max([e[1] for e in block[half:]])]
+        return entry
+
+    def delete(self,handle):
+        """
+        @brief Removes an interval
+        @param handle as returned by insert
+        """
+        # equal starts may span several blocks
+        i = max(bisect_left(self._mins,handle[0]) - 1, 0)
+        while i < len(self._blocks) and self._mins[i] <= handle[0]:
+            block = self._blocks[i]
+            j = bisect_left(block,handle)
+            if j < len(block) and block[j] == handle:
+                del block[j]
+                del self._values[handle[2]]
+                self._len -= 1
+                if not block:
+                    del self._blocks[i], self._mins[i], self._maxEnds[i]
+                else:
+                    self._mins[i] = block[0][0]
+                    if handle[1] == self._maxEnds[i]: self._maxEnds[i] = max([e[1] for e in block])
+                return
+            i += 1
+        raise KeyError, "interval not in index"
+
+    #############################################################################
+
+    def overlap(self,start,end):
+        """
+        @brief Intervals overlapping [start, end] (bounds included)
+        @param start DateTime object
+        @param end DateTime object
+        @return list of values, sorted by start of interval
+        """
+        start, end = _ticks(start), _ticks(end)
+        low = start - self._maxLength
+        values = self._values
+        result = []
+        i = max(bisect_left(self._mins,low) - 1, 0)
+        while i < len(self._blocks) and self._mins[i] <= end:
+            if self._maxEnds[i] >= start:
+                block = self._blocks[i]
+                j = bisect_left(block,(low,))
+                for entry in block[j:bisect_right(block,(end,_INF))]:
+                    if entry[1] >= start: result.append(values[entry[2]])
+            i += 1
+        return result
+
+    def stab(self,instant):
+        """
+        @brief Intervals containing an instant (bounds included)
+        @param instant DateTime object
+        @return list of values, sorted by start of interval
+        """
+        return self.overlap(instant,instant)
+
+#############################################################################
+#############################################################################
+#############################################################################
+
+# -- Arrays
+
+class DateTimeArray(object):
+    """
+    @brief Class for managing columns of DateTimes sharing one TimeZone.
+           Stores instants as a NumPy int64 array of epoch seconds (UTC),
+           operations are vectorized on the whole column. Needs numpy.
+    @param epochs seconds since epoch (UTC), any array-like
+    @param tz TimeZone object (default UTC)
+
+    Instants around the start of DST in Rome (2011-03-27T01:00:00Z)
+
+    >>> tz = TimeZone('Europe/Rome')
+    >>> a = DateTimeArray([1301185800, 1301185800 + 3600], tz)
+    >>> print ", ".join(a.formatISO())
+    2011-03-27T01:30:00+01:00, 2011-03-27T03:30:00+02:00
+    >>> print ", ".join(a.formatISO(part='time', offset=False))
+    01:30:00, 03:30:00
+    >>> (a - a[0]).tolist()
+    [0.0, 3600.0]
+    >>> print a[1]
+    2011-03-27T03:30:00 Europe/Rome
+    >>> print ", ".join((a + TimeDelta(hours=24)).formatISO())
+    2011-03-28T01:30:00+02:00, 2011-03-28T03:30:00+02:00
+    >>> (DateTimeArray.fromList(a.toList()) == a).all()
+    True
+    >>> len(DateTimeArray([], tz).formatISO(part='time'))
+    0
+    """
+
+    def __init__(self,epochs=(),tz=None):
+        """
+        DateTimeArray([ticks,...],[TimeZone])
+        DateTimeArray.fromList([DateTime,...],[TimeZone])
+        """
+        if numpy is None:
+            raise ImportError, "DateTimeArray needs numpy"
+        self.__dict__["epochs"] = numpy.array(epochs,dtype=numpy.int64)
+        self.__dict__["timezone"] = tz or TimeZone()
+
+    def __setattr__(self,arg,value):
+        raise AttributeError, "DateTimeArray objects are read only"
+
+    @classmethod
+    def _new(cls,epochs,timezone):
+        obj = object.__new__(cls)
+        obj.__dict__["epochs"] = epochs
+        obj.__dict__["timezone"] = timezone
+        return obj
+
+    @classmethod
+    def fromList(cls,dts,tz=None):
+        """
+        @brief Classmethod to build from a list of DateTime objects
+        @param dts list of DateTime objects
+        @param tz TimeZone object (default: zone of the first DateTime, or UTC)
+        @return DateTimeArray object
+        """
+        if numpy is None:
+            raise ImportError, "DateTimeArray needs numpy"
+        if tz is None:
+            tz = dts and dts[0].timezone or TimeZone()
+        ticks = numpy.fromiter((d.gmticks for d in dts),dtype=numpy.float64,count=len(dts))
+        return cls._new(numpy.floor(ticks).astype(numpy.int64),tz)
+
+    @classmethod
+    def _fromParsed(cls,rows,tz):
+        """
+        @brief Hidden classmethod. Builds from the parsed rows of DateTime.parse_many
+        @param rows list of (seconds, offset, zone) tuples (see DateTime._inferWallParser),
+               None for the rows not parsed
+        @param tz TimeZone object (default: zone of the first row, or UTC)
+        @return tuple (DateTimeArray of the parsed rows, numpy boolean array marking them)
+        """
+        valid = numpy.fromiter((row is not None for row in rows),dtype=bool,count=len(rows))
+        rows = [row for row in rows if row is not None]
+        if tz is None:
+            tz = rows and rows[0][2] or TimeZone()
+        epochs = numpy.fromiter((row[0] - (row[1] or 0) for row in rows),dtype=numpy.int64,count=len(rows))
+        # wall clock rows, without offset, converted per zone
+        local = {}
+        for i, row in enumerate(rows):
+            if row[1] is None: local.setdefault(row[2],[]).append(i)
+        for zone, idx in local.iteritems():
+            timezone = zone or tz
+            idx = numpy.array(idx,dtype=numpy.intp)
+            epochs[idx] = cls._fromWall(epochs[idx],timezone).epochs
+        return (cls._new(epochs,tz), valid)
+
+    def toList(self):
+        """
+        @brief Converts to a list of DateTime objects
+        @return list
+        """
+        days, seconds = divmod(self._wall(),86400)
+        tz = self.timezone
+        return [DateTime._fromMx(mxdt.DateTimeFromAbsDateTime(d + _EPOCH_ABSDATE, float(s)),tz)
+                for d, s in zip(days.tolist(),seconds.tolist())]
+
+    #############################################################################
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def __iter__(self):
+        return iter(self.toList())
+
+    def __getitem__(self,key):
+        if isinstance(key,(int,long)):
+            return DateTime._fromTicks(int(self.epochs[key]),self.timezone)
+        return DateTimeArray._new(self.epochs[key],self.timezone)
+
+    def __str__(self):
+        return "[%s] %s" % (", ".join(self.formatISO(offset=False)),self.zone)
+
+    def __repr__(self):
+        return r"<%s(%d, '%s')>" % (self.__class__.__name__, len(self), self.zone)
+
+    @property
+    def zone(self): return self.timezone.zone
+
+    #############################################################################
+
+    @classmethod
+    def _table(cls,timezone):
+        """
+        @brief Hidden classmethod. Transition table of timezone as numpy arrays
+        """
+        table = timezone.__dict__.get("_arrays")
+        if table is None:
+            table = [numpy.array(t,dtype=numpy.int64) for t in timezone._table[:3]]
+            timezone.__dict__["_arrays"] = table
+        return table
+
+    def _offsets(self):
+        """
+        @brief Hidden function. Offsets from UTC (seconds) of every instant
+        """
+        utc, local, offsets = self._table(self.timezone)
+        idx = numpy.searchsorted(utc,self.epochs,side="right") - 1
+        return offsets[numpy.maximum(idx,0)]
+
+    def _wall(self):
+        """
+        @brief Hidden function. Wall clock seconds in the array's TimeZone
+        """
+        return self.epochs + self._offsets()
+
+    @classmethod
+    def _fromWall(cls,wall,timezone):
+        """
+        @brief Hidden classmethod. Builds from wall clock seconds in timezone
+        """
+        utc, local, offsets = cls._table(timezone)
+        idx = numpy.searchsorted(local,wall,side="right") - 1
+        return cls._new(wall - offsets[numpy.maximum(idx,0)],timezone)
+
+    #############################################################################
+
+    def toTZ(self,tz):
+        """
+        @brief Change TimeZone (instants are unchanged)
+        @param tz new TimeZone
+        @return DateTimeArray object
+        """
+        if self.timezone == tz: return self
+        return DateTimeArray._new(self.epochs,tz)
+
+    def toUTC(self):
+        """
+        @brief Change TimeZone to UTC
+        @return DateTimeArray object
+        """
+        return self.toTZ(TimeZone())
+
+    #############################################################################
+
+    def _truncate(self,unit):
+        """
+        @brief Hidden function. Wall clock seconds of the start and of the end
+               of the year ('Y'), month ('M') or week ('W') of every instant
+        """
+        wall = self._wall()
+        if unit == "W":
+            days = wall // 86400
+            start = days - (days + 3) % 7 # 1970-01-01 is a Thursday
+            return start*86400, (start + 7)*86400 - 1
+        start = wall.astype("datetime64[s]").astype("datetime64[%s]" % unit)
+        end = start + 1
+        return start.astype("datetime64[s]").astype(numpy.int64), end.astype("datetime64[s]").astype(numpy.int64) - 1
+
+    def _boundary(self,unit):
+        start, end = self._truncate(unit)
+        return (DateTimeArray._fromWall(start,self.timezone), DateTimeArray._fromWall(end,self.timezone))
+
+    def yearBoundary(self):
+        """
+        @brief Return start and end of the year of every instant
+        @return a tuple containing start and end of year as DateTimeArray objects
+        """
+        return self._boundary("Y")
+
+    def monthBoundary(self):
+        """
+        @brief Return start and end of the month of every instant
+        @return a tuple containing start and end of month as DateTimeArray objects
+        """
+        return self._boundary("M")
+
+    def weekBoundary(self):
+        """
+        @brief Return start and end of the week of every instant
+        @return a tuple containing start and end of week as DateTimeArray objects
+        """
+        return self._boundary("W")
+
+    #############################################################################
+
+    def formatISO(self, offset=True, part="full"):
+        """
+        @brief Format as ISO (YYYY-MM-DDThh:mm:ss+hh:mm) (without TimeZone, only offset)
+        @param offset Print tz offset
+        @param part "full", "date", "time"
+        @return numpy array of strings
+        """
+        if part not in ("full", "date", "time"):
+            raise Exception("Unknown part type '%s', use one of 'full', 'date', 'time'" % part)
+        if not len(self.epochs):
+            return numpy.array([],dtype=numpy.unicode_)
+        offsets = self._offsets()
+        wall = (self.epochs + offsets).astype("datetime64[s]")
+        if part == "date":
+            return numpy.datetime_as_string(wall,unit="D")
+        output = numpy.datetime_as_string(wall,unit="s")
+        if part == "time":
+            # keep hh:mm:ss out of YYYY-MM-DDThh:mm:ss
+            chars = output.view(output.dtype.kind + "1").reshape(len(output),-1)
+            output = numpy.ascontiguousarray(chars[:,11:19]).view(output.dtype.kind + "8").ravel()
+        if not offset:
+            return output
+        values, inverse = numpy.unique(offsets,return_inverse=True)
+        suffixes = numpy.array([_offsetString(v) for v in values.tolist()])
+        return numpy.char.add(output,suffixes[inverse])
+
+    #############################################################################
+
+    def _other(self,other):
+        if isinstance(other,DateTimeArray): return other.epochs
+        if isinstance(other,DateTime): return other.gmticks
+        raise TypeError, "supports only DateTime and DateTimeArray objects"
+
+    def __eq__(self, other): return self.epochs == self._other(other)
+    def __ne__(self, other): return self.epochs != self._other(other)
+    def __lt__(self, other): return self.epochs < self._other(other)
+    def __le__(self, other): return self.epochs <= self._other(other)
+    def __gt__(self, other): return self.epochs > self._other(other)
+    def __ge__(self, other): return self.epochs >= self._other(other)
+
+    #############################################################################
+
+    def __add__(self,other):
+        # wall clock arithmetic, as DateTime + TimeDelta
+        if isinstance(other,TimeDelta):
+            return DateTimeArray._fromWall(self._wall() + int(round(other.seconds)),self.timezone)
+        else: raise TypeError, "supports only TimeDelta objects"
+
+    def __sub__(self,other):
+        if isinstance(other,TimeDelta):
+            return self.__add__(-other)
+        elif isinstance(other,(DateTime,DateTimeArray)):
+            # seconds between instants
+            return self.epochs - self._other(other)
+        else:
+            raise TypeError, "supports only DateTime, DateTimeArray and TimeDelta objects"
+
+#############################################################################
+#############################################################################
+#############################################################################
+
+# -- Formatting
+
+_namedFormats = ('short', 'medium', 'long', 'full')
+
+# (locale, part, format) -> formatting function, see _formatter
+_formatters = LRUCache(maxsize=1024)
+
+def _formatter(locale, part, format):
+    """
+    @brief Hidden function. Babel formatter, built once per (locale, part, format)
+    @param locale babel.Locale object
+    @param part 'date', 'time' or 'datetime'
+    @param format 'short', 'medium', 'long', 'full', 'notYear' or a babel pattern
+    @return function formatting a datetime (or date, time) as babel.dates.format_<part>
+    """
+    key = (str(locale), part, format)
+    formatter = _formatters.get(key)
+    if formatter is None:
+        formatter = _makeFormatter(locale, part, format)
+        _formatters[key] = formatter
+    return formatter
+
+def _makeFormatter(locale, part, format):
+    """
+    @brief Hidden function. Resolves the babel patterns of a formatter
+    """
+    if format == 'notYear':
+        if part == 'date':
+            pattern = locale.date_formats['short'].pattern
+            for year in ('/yyyy', 'yyyy/', '/yy', 'yy/'):
+                pattern = pattern.replace(year, '')
+            format = pattern
+        if part == 'time':
+            format = 'short'
+
+    if part == 'datetime':
+        if format in _namedFormats:
+            combined = babeldates.get_datetime_format(format, locale=locale).replace("'", "")
+            formatDate = _formatter(locale, 'date', format)
+            formatTime = _formatter(locale, 'time', format)
+            return lambda value: combined.replace('{0}', formatTime(value)).replace('{1}', formatDate(value))
+        pattern = babeldates.parse_pattern(format)
+        return lambda value: pattern.apply(value, locale)
+
+    if part == 'date':
+        if format in _namedFormats: format = babeldates.get_date_format(format, locale=locale)
+        pattern = babeldates.parse_pattern(format)
+        def formatDate(value):
+            if isinstance(value, pydt.datetime): value = value.date()
+            return pattern.apply(value, locale)
+        return formatDate
+
+    if part == 'time':
+        if format in _namedFormats: format = babeldates.get_time_format(format, locale=locale)
+        pattern = babeldates.parse_pattern(format)
+        def formatTime(value):
+            if value.tzinfo is None: value = value.replace(tzinfo=pytz.utc)
+            if isinstance(value, pydt.datetime): value = value.timetz()
+            return pattern.apply(value, locale)
+        return formatTime
+
+    raise Exception("Unknown part type '%s', use one of 'date', 'time', 'datetime'" % part)
+
+#############################################################################
+#############################################################################
+#############################################################################
+
 # -- Patterns 
 
 def getPattern(locale=None, part='date', format='short', returns='strftime'):
+    """
+    @brief Pattern of a locale, converted from babel. The conversion is cached on
+           the babel pattern itself (see convertDateFormat), not on the locale name:
+           a plain babel Locale and the one patched by makeLocale differ
+
+    >>> from babel import Locale
+    >>> print getPattern(Locale('it', 'IT')), getPattern(makeLocale('it_IT'))
+    %d/%m/%y %d/%m/%Y
+    """
     if not locale: locale = makeLocale()
-    babelPattern=eval('locale.%s_formats["%s"].pattern' % (part, format))
-    return convertDateFormat(babelPattern,inputFormat='babel',outputFormat=returns)
+    babelPattern = getattr(locale, '%s_formats' % part)[format].pattern
+    return convertDateFormat(babelPattern, inputFormat='babel', outputFormat=returns)
+
+def patternCacheInfo():
+    """
+    @brief Statistics of the pattern conversion cache of getPattern and convertDateFormat
+    @return dict with a 'conversions' entry, see LRUCache.info
+    """
+    return { 'conversions': _conversions.info() }
 
 def strftimePatternDate(locale=None, format='short'):
     return getPattern(locale=locale, part='date', format=format, returns='strftime')
@@ -945,48 +2582,60 @@ def humanPatternTime(locale=None, format='short'):
 def humanPatternDateTime(locale=None, format='short'):
     return "%s %s" % (humanPatternDate(locale=locale, format=format), humanPatternTime(locale=locale, format=format))
 
+_dateFormatSubst={ 'babel-strftime': [('d{1,2}', '%d'),
+                                     ('m{1,2}', '%M'),
+                                     ('(?<!%)M{1,2}', '%m'),
+                                     ('y{3,}', '%Y'),
+                                     ('y{1,2}', '%y'),
+                                     ('h{1,2}', '%I'),
+                                     ('H{1,2}', '%H'),
+                                     ('a', '%p'),
+                                     ('s{1,2}', '%S')],
+                     'babel-human': [('d{1,2}', 'dd'),
+                                     ('[mM]{1,2}', 'mm'),
+                                     ('y{3,}', 'yyyy'),
+                                     ('y{1,2}(?!y)', 'yy'),
+                                     ('h{1,2}', 'h12'),
+                                     ('H{1,2}', 'h24'),
+                                     ('a', 'AM/PM'),
+                                     ('s{1,2}', 'ss')],
+                  'strftime-babel': [('%d','dd'),
+                                     ('%M','mm'),
+                                     ('%m','MM'),
+                                     ('%Y','yyyy'),
+                                     ('%y','yy'),
+                                     ('%I','hh'),
+                                     ('%H','HH'),
+                                     ('%p','a'),
+                                     ('%S','ss')],
+                  'strftime-human': [('%d','dd'),
+                                     ('%M','mm'),
+                                     ('%m','mm'),
+                                     ('%Y','yyyy'),
+                                     ('%y','yy'),
+                                     ('%I','h12'),
+                                     ('%H','h24'),
+                                     ('%p','AM/PM'),
+                                     ('%S','ss')]
+                }
+
+# precompiled substitutions, by "<inputFormat>-<outputFormat>"
+_dateFormatSubst=dict((k, [(re.compile(pat), repl) for pat, repl in v]) for k, v in _dateFormatSubst.items())
+
+# (inputPattern, inputFormat, outputFormat) -> output pattern
+_conversions = LRUCache(maxsize=512)
+
 def convertDateFormat(inputPattern, outputFormat='strftime',inputFormat='babel'):
-    subst={ 'babel-strftime': [('d{1,2}', '%d'),
-                               ('m{1,2}', '%M'),
-                               ('(?<!%)M{1,2}', '%m'),
-                               ('y{3,}', '%Y'),
-                               ('y{1,2}', '%y'),
-                               ('h{1,2}', '%I'),
-                               ('H{1,2}', '%H'),
-                               ('a', '%p'),
-                               ('s{1,2}', '%S')],
-               'babel-human': [('d{1,2}', 'dd'),
-                               ('[mM]{1,2}', 'mm'),
-                               ('y{3,}', 'yyyy'),
-                               ('y{1,2}(?!y)', 'yy'),
-                               ('h{1,2}', 'h12'),
-                               ('H{1,2}', 'h24'),
-                               ('a', 'AM/PM'),
-                               ('s{1,2}', 'ss')],
-            'strftime-babel': [('%d','dd'),
-                               ('%M','mm'),
-                               ('%m','MM'),
-                               ('%Y','yyyy'),
-                               ('%y','yy'),
-                               ('%I','hh'),
-                               ('%H','HH'),
-                               ('%p','a'),
-                               ('%S','ss')],
-            'strftime-human': [('%d','dd'),
-                               ('%M','mm'),
-                               ('%m','mm'),
-                               ('%Y','yyyy'),
-                               ('%y','yy'),
-                               ('%I','h12'),
-                               ('%H','h24'),
-                               ('%p','AM/PM'),
-                               ('%S','ss')]
-          }
-
-    outputPattern=inputPattern
-    if not subst.has_key("%s-%s" % (inputFormat,outputFormat)): return None
-    for pat in subst["%s-%s" % (inputFormat,outputFormat)]:
-        outputPattern=re.sub(pat[0], pat[1], outputPattern)
+    subst=_dateFormatSubst.get("%s-%s" % (inputFormat,outputFormat))
+    if subst is None: return None
+
+    key=(inputPattern, inputFormat, outputFormat)
+    outputPattern=_conversions.get(key)
+    if outputPattern is None:
+        outputPattern=inputPattern
+        for regex, repl in subst:
+            outputPattern=regex.sub(repl, outputPattern)
+        _conversions[key]=outputPattern
 
     return outputPattern
 
@@ -1000,14 +2649,32 @@ __formatMapping={ 'short': 'abbreviated',
                   'long': 'wide',
                   'single': 'narrow' }
 
+# (locale, kind, format) -> tuple of (#, name), see _localeTable
+_localeTables = {}
+
+def _localeTable(locale, kind, format):
+    """
+    @brief Hidden function. Sorted and capitalized names of months or days
+    @param locale babel.Locale object
+    @param kind 'months' or 'days'
+    @param format short, long or single
+    @return tuple of tuples (#, name)
+    """
+    key = (str(locale), kind, format)
+    table = _localeTables.get(key)
+    if table is None:
+        names = getattr(locale, kind)['format'][__formatMapping[format]]
+        table = tuple([(k, names[k].capitalize()) for k in sorted(names.keys())])
+        _localeTables[key] = table
+    return table
+
 def monthsList(locale=None, format='short'):
     """
     @brief Return an ordered array of tuples, each tuple is (# of month, name of month)
     Format can be: short, long or single
     """
     if not locale: locale = makeLocale()
-    localeMonths=locale.months['format'][__formatMapping[format]]
-    return [(k, localeMonths[k].capitalize()) for k in sorted(localeMonths.keys())]
+    return list(_localeTable(locale, 'months', format))
 
 def daysList(locale=None, format='short'):
     """
@@ -1015,8 +2682,19 @@ def daysList(locale=None, format='short'):
     Format can be: short, long or single
     """
     if not locale: locale = makeLocale()
-    localeDays=locale.days['format'][__formatMapping[format]]
-    return [(k, localeDays[k].capitalize()) for k in sorted(localeDays.keys())]
+    return list(_localeTable(locale, 'days', format))
+
+def preloadLocaleTables(locales, formats=('short', 'long', 'single')):
+    """
+    @brief Builds months and days tables of the given locales, to be called at application start
+    @param locales list of babel.Locale objects or language strings (as makeLocale)
+    @param formats formats to preload
+    """
+    for locale in locales:
+        if isinstance(locale, basestring): locale = makeLocale(locale)
+        for format in formats:
+            _localeTable(locale, 'months', format)
+            _localeTable(locale, 'days', format)
 
 
 #############################################################################
@@ -1026,11 +2704,104 @@ def daysList(locale=None, format='short'):
 # PICKLING
 
 ### Make the types pickleable:
+# DateTime, Date and TimeDelta are pickled in a compact, versioned form:
+#   DateTime  (version, wall clock seconds since epoch, microseconds, zone)
+#   TimeDelta (version, microseconds)
+# the wall clock time is kept as it is, also inside a DST gap (version 1 held
+# the UTC epoch and normalized those times on load).
+# older pickles are still loaded: DateTime and TimeDelta ones hold a string
+# (str() of the object), Date ones the instance __dict__ (see DateTime.__setstate__)
+_PICKLE_VERSION = 2
+
+# str() of a TimeDelta: [-][DDd][hh:][mm:]ss
+_timeDeltaStrRe = re.compile(r'^(-)?(?:(\d+)d)?(?:(?:(\d+):)?(\d+):)?(\d+)$')
+
+def _dumpDateTime(d):
+    mxObj = d._mxObj
+    seconds = int(mxObj.abstime)
+    microseconds = int(round((mxObj.abstime - seconds)*1e6))
+    if microseconds == 1000000:
+        seconds, microseconds = seconds + 1, 0
+    seconds += (mxObj.absdate - _EPOCH_ABSDATE)*86400
+    return (_PICKLE_VERSION, seconds, microseconds, intern(str(d.zone)))
+
+def _loadDateTime(cls,mark):
+    r"""
+    @brief Hidden function. Builds a cls object from a pickled mark: the compact
+           tuple, the string of older DateTime pickles or the state of older Date ones
+
+    Pickles made before the compact form
+
+    >>> import pickle
+    >>> pickle.loads("coxylib.DateTime\n_PDT\np0\n(S'2011-03-27T03:30:00 Europe/Rome'\np1\ntp2\nRp3\n.")
+    <DateTime('2011-03-27T03:30:00 Europe/Rome')>
+    >>> pickle.loads('\x80\x02coxylib.DateTime\n_PDT\nq\x00U\x1f2011-03-27T03:30:00 Europe/Romeq\x01\x85q\x02Rq\x03.').utcoffset
+    <TimeDelta('02:00:00')>
+    >>> pickle.loads("coxylib.DateTime\n_PTD\np0\n(S'01d02:03:04'\np1\ntp2\nRp3\n.").seconds
+    93784.0
+    >>> pickle.loads('\x80\x02coxylib.DateTime\n_PTD\nq\x00U\x06-01:30q\x01\x85q\x02Rq\x03.')
+    <TimeDelta('-01:30')>
+    >>> pickle.loads('\x80\x02coxylib.DateTime\nDate\nq\x00)\x81q\x01}q\x02(U\x04zoneq\x03U\x0bEurope/Romeq\x04'
+    ...              'U\x03dstq\x05coxylib.DateTime\n_PTD\nq\x06U\x0200q\x07\x85q\x08Rq\tU\tutcoffsetq\nh\x06'
+    ...              'U\x0801:00:00q\x0b\x85q\x0cRq\rU\x06tznameq\x0eU\x03CETq\x0fU\x08timezoneq\x10'
+    ...              'coxylib.DateTime\n_PTZ\nq\x11h\x04\x85q\x12Rq\x13U\x06_mxObjq\x14'
+    ...              'cmx.DateTime\nDateTimeFromAbsDateTime\nq\x15J\x0f4\x0b\x00G\x00\x00\x00\x00\x00\x00\x00\x00\x86q\x16Rq\x17ub.')
+    <Date('2011-03-27')>
+
+    (the mx object of the Date written as a DateTimeFromAbsDateTime call)
+
+    The compact form
+
+    >>> d = DateTime(2011,10,30,2,30,0.5,TimeZone('Europe/Rome'))
+    >>> pickle.dumps(d, 2)
+    '\x80\x02coxylib.DateTime\n_PDT\nq\x00(K\x02J\xa8\xb6\xacNJ \xa1\x07\x00U\x0bEurope/Romeq\x01tq\x02\x85q\x03Rq\x04.'
+    >>> pickle.loads(pickle.dumps(d, 2)).info()
+    '2011-10-30T02:30:00+01:00 CET (Europe/Rome)'
+
+    Wall clock times inside a DST gap come back unchanged, version 1 marks
+    (UTC epoch) normalize them
+
+    >>> gap = DateTime(2011,3,27,2,30,0,TimeZone('Europe/Rome'))
+    >>> pickle.loads(pickle.dumps(gap, 2)).info()
+    '2011-03-27T02:30:00+01:00 CET (Europe/Rome)'
+    >>> _PDT((1, int(gap.gmticks), 0, 'Europe/Rome')).info()
+    '2011-03-27T03:30:00+02:00 CEST (Europe/Rome)'
+    >>> _PD(_dumpDateTime(d)), _PD(dict(_mxObj=d._mxObj, timezone=d.timezone))
+    (<Date('2011-10-30')>, <Date('2011-10-30')>)
+    """
+    if isinstance(mark,dict): return cls._fromMx(mark["_mxObj"],mark["timezone"])
+    if not isinstance(mark,tuple): return cls(mark)
+    if mark[0] not in (1, _PICKLE_VERSION):
+        raise ValueError, "unsupported %s pickle version %s" % (cls.__name__, mark[0])
+    version, seconds, microseconds, zone = mark
+    timezone = TimeZone(zone)
+    if version == 1: seconds += timezone._offsetFromTicks(seconds)
+    days, seconds = divmod(seconds, 86400)
+    mxObj = mxdt.DateTimeFromAbsDateTime(days + _EPOCH_ABSDATE, seconds + microseconds/1e6)
+    return cls._fromMx(mxObj,timezone)
+
+def _loadTimeDelta(cls,mark):
+    if not isinstance(mark,tuple):
+        m = _timeDeltaStrRe.match(mark)
+        if not m: return cls(mark)
+        sign, days, hours, minutes, seconds = m.groups()
+        us = (((int(days or 0)*24 + int(hours or 0))*60 + int(minutes or 0))*60 + int(seconds))*1000000
+        if sign: us = -us
+        return cls._fromMicroseconds(us)
+    if mark[0] not in (1, _PICKLE_VERSION):
+        raise ValueError, "unsupported %s pickle version %s" % (cls.__name__, mark[0])
+    return cls._fromMicroseconds(mark[1])
+
+def _loadRelativeDateTime(cls,key):
+    return cls._fromKey(key)
+
 # Shortcuts for pickle (reduces the pickle's length)
 def _PDT(mark):
-    return DateTime(mark)
+    return _loadDateTime(DateTime,mark)
+def _PD(mark):
+    return _loadDateTime(Date,mark)
 def _PTD(mark):
-    return TimeDelta(mark)
+    return _loadTimeDelta(TimeDelta,mark)
 def _PRDT(mark):
     return RelativeDateTime(mark)
 def _PTZ(mark):
@@ -1041,13 +2812,19 @@ class modinit:
 
     import copy_reg
     def pickle_DateTime(d):
-        return _PDT,(str(d),)
+        return _PDT,(_dumpDateTime(d),)
     copy_reg.pickle(DateTime,
                     pickle_DateTime,
                     _PDT)
 
+    def pickle_Date(d):
+        return _PD,(_dumpDateTime(d),)
+    copy_reg.pickle(Date,
+                    pickle_Date,
+                    _PD)
+
     def pickle_TimeDelta(d):
-        return _PTD,(str(d),)
+        return _PTD,((_PICKLE_VERSION, d._us),)
     copy_reg.pickle(TimeDelta,
                     pickle_TimeDelta,
                     _PTD)
@@ -1065,3 +2842,8 @@ class modinit:
                     _PTZ)
 
 del modinit
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
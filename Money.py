@@ -7,7 +7,9 @@ $Id$
 
 from oxylib.customtypes import sdict
 import decimal as dc
+import threading
 from babel import numbers as n
+from babel import Locale
 
 # *************************************************************************** #
 # MONEY FOR ALL
@@ -215,6 +217,187 @@ class MoneyInterface(object):
     # def html(self): return self.currency_obj.html
 
 
+# (currency class, currency id) -> number of decimal places of the minor unit
+_exponents = {}
+# ISO codes of the currencies known to babel, see _babelExponent
+_babelCurrencies = None
+# ISO code -> decimal places of the minor unit, None if unknown to babel
+_babelExponents = {}
+# decimal places of the minor unit of the codes unknown to babel
+_defaultExponent = 2
+
+def _babelExponent(label):
+    """
+    Decimal places of the minor unit of an ISO currency code, None if unknown to babel.
+    Looked up once per code
+    """
+    global _babelCurrencies
+    if label in _babelExponents:
+        return _babelExponents[label]
+    if _babelCurrencies is None:
+        _babelCurrencies = frozenset(Locale('en').currencies)
+    exponent = None
+    if label in _babelCurrencies:
+        exponent = n.get_currency_precision(label)
+    return _babelExponents.setdefault(label, exponent)
+
+class MinorMoneyInterface(MoneyInterface):
+    """
+    Money stored as an integer number of minor units (e.g. cents), same API as
+    MoneyInterface. The exponent of the minor unit is read from currency.exponent
+    when defined, else from babel (2 for EUR, 0 for JPY...), default 2 for the
+    codes unknown to babel. A missing or unknown currency raises ValueError.
+    Sums and differences are exact, products and divisions are rounded
+    half up to the minor unit, Decimal is only used to read and write amount.
+    """
+    __currencyclass__ = None
+
+    def __init__(self, amount, currency):
+
+        self.__currencyclass__ = self.__class__.__currencyclass__
+        self.currency_obj = None # Caching object
+        if not self.__currencyclass__:
+            raise NotImplementedError, "__currencyclass__ is not defined. Define a complete Currency class"
+
+        self.currency_id = None
+        if isinstance(currency, self.__currencyclass__):
+            self.currency_obj = currency
+            self.currency_id = currency.id
+        elif isinstance(currency, (int, long)):
+            self.currency_id = currency
+
+        self.minor = self._toMinor(amount)
+
+    @classmethod
+    def fromMinor(cls, minor, currency):
+        """
+        Build from an integer number of minor units
+        """
+        obj = object.__new__(cls)
+        obj.__currencyclass__ = cls.__currencyclass__
+        obj.minor = minor
+        if isinstance(currency, cls.__currencyclass__):
+            obj.currency_obj = currency
+            obj.currency_id = currency.id
+        else:
+            obj.currency_obj = None
+            obj.currency_id = currency
+        return obj
+
+    def _new(self, minor):
+        return self.fromMinor(minor, self.currency_obj or self.currency_id)
+
+    @property
+    def exponent(self):
+        """
+        Decimal places of the minor unit of the currency
+        """
+        key = (self.__currencyclass__, self.currency_id)
+        exponent = _exponents.get(key)
+        if exponent is None:
+            if self.currency_id is None:
+                raise ValueError('%s without currency has no minor unit' % self.__class__.__name__)
+            currency = self.currency
+            if currency is None:
+                raise ValueError('Unknown currency id %s' % self.currency_id)
+            exponent = getattr(currency, 'exponent', None)
+            if exponent is None:
+                exponent = _babelExponent(currency.label)
+            if exponent is None:
+                # not cached: the currency may define its exponent later
+                return _defaultExponent
+            exponent = _exponents.setdefault(key, exponent)
+        return exponent
+
+    def _toMinor(self, amount):
+        """
+        Number of minor units of a number, rounded half up
+        """
+        if isinstance(amount, (int, long)):
+            return amount * 10**self.exponent
+        if not isinstance(amount, dc.Decimal):
+            amount = dc.Decimal(str(amount))
+        return int(amount.scaleb(self.exponent).to_integral_value(rounding=dc.ROUND_HALF_UP))
+
+    @property
+    def amount(self):
+        return dc.Decimal(self.minor).scaleb(-self.exponent)
+
+    @property
+    def rounded(self):
+        """
+        Return amount (always at the precision of the currency)
+        """
+        return self.amount
+
+    def __str__(self): return "%s %s" % (self.amount, self.currency)
+    def __repr__(self): return "<Money(amount=%s, currency=%s)>" % (self.amount, self.currency_id)
+
+    # Algebra
+    def __eq__(self, other): return (self.minor == other.minor) and (self.currency_id == other.currency_id)
+
+    def __lt__(self, other):
+        return (self.minor < other.minor) and (self.currency_id == other.currency_id)
+
+    def __le__(self, other):
+        return (self.minor <= other.minor) and (self.currency_id == other.currency_id)
+
+    def _otherMinor(self, other, operation):
+        if isinstance(other, MinorMoneyInterface):
+            if self.currency_id != other.currency_id:
+                raise Exception('It is not possible to %s %s with different currencies' % (operation, self.__class__.__name__))
+            return other.minor
+        return self._toMinor(other)
+
+    def __add__(self, other):
+        return self._new(self.minor + self._otherMinor(other, 'sum'))
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._new(self.minor - self._otherMinor(other, 'subtract'))
+
+    def __rsub__(self, other):
+        return self._new(self._otherMinor(other, 'subtract') - self.minor)
+
+    def __neg__(self):
+        return self._new(-self.minor)
+
+    def __mul__(self, mul):
+        if isinstance(mul, (int, long)):
+            return self._new(self.minor * mul)
+        if not isinstance(mul, dc.Decimal):
+            mul = dc.Decimal(str(mul))
+        return self._new(int((self.minor * mul).to_integral_value(rounding=dc.ROUND_HALF_UP)))
+    __rmul__ = __mul__
+
+    def __div__(self, div):
+        if not isinstance(div, dc.Decimal):
+            div = dc.Decimal(str(div))
+        return self._new(int((self.minor / div).to_integral_value(rounding=dc.ROUND_HALF_UP)))
+
+    def __rdiv__(self, div):
+        return self.__class__(amount=dc.Decimal(str(div))/self.amount, currency=self.currency_obj or self.currency_id)
+
+    def allocate(self, ratios):
+        """
+        Split in parts proportional to ratios (non negative integers), without
+        losing minor units: the remainder goes one unit at a time to the parts
+        with the largest fractional remainder (the first on ties), never to a
+        zero ratio
+        """
+        if [ratio for ratio in ratios if ratio < 0]:
+            raise ValueError('ratios must not be negative')
+        total = sum(ratios)
+        if not total:
+            raise ValueError('ratios must not sum to zero')
+        parts = [self.minor * ratio // total for ratio in ratios]
+        order = sorted([i for i, ratio in enumerate(ratios) if ratio],
+                       key=lambda i: (-(self.minor * ratios[i] % total), i))
+        for i in order[:self.minor - sum(parts)]:
+            parts[i] += 1
+        return [self._new(part) for part in parts]
+
+
 # SAMPLE IMPLEMENTATIONS
 
 class CurrencyPlain(CurrencyInterface):
@@ -231,13 +414,42 @@ class CurrencyPlain(CurrencyInterface):
     False
     >>> c1 < c2
     False
+    >>> print CurrencyPlain.byId('2').label
+    USD
+    >>> print CurrencyPlain.byLabel('GBP')
+    £
+    >>> print CurrencyPlain.bySymbol('$').label
+    USD
+
+    The first currency registered with an id, label or symbol wins
+
+    >>> first = CurrencyPlain.byId(1)
+    >>> CurrencyPlain.byId(1) is CurrencyPlain(1, 'EUR', '€', '&euro;')
+    False
+    >>> CurrencyPlain.byId(1) is first
+    True
+    >>> CurrencyPlain.byLabel('XXX') is None
+    True
 
     """
     _currencies = []
+    # id, label and symbol -> currency, updated on registration
+    _byId = {}
+    _byLabel = {}
+    _bySymbol = {}
+    _lock = threading.Lock()
 
     def __init__(self, id, label, symbol, html):
         CurrencyInterface.__init__(self, id, label, symbol, html)
-        self.__class__._currencies.append(self)
+        cls = self.__class__
+        cls._lock.acquire()
+        try:
+            cls._currencies.append(self)
+            cls._byId.setdefault(self.id, self)
+            cls._byLabel.setdefault(self.label, self)
+            cls._bySymbol.setdefault(self.symbol, self)
+        finally:
+            cls._lock.release()
 
     @classmethod
     def currencies(cls):
@@ -245,18 +457,15 @@ class CurrencyPlain(CurrencyInterface):
 
     @classmethod
     def byId(cls, id):
-        c = [x for x in cls._currencies if x.id == int(id)]
-        if c: return c[0]
+        return cls._byId.get(int(id))
 
     @classmethod
     def byLabel(cls, label):
-        c = [x for x in cls._currencies if x.label == label]
-        if c: return c[0]
+        return cls._byLabel.get(label)
 
     @classmethod
     def bySymbol(cls, symbol):
-        c = [x for x in cls._currencies if x.symbol == symbol]
-        if c: return c[0]
+        return cls._bySymbol.get(symbol)
 
 
 class MoneyPlain(MoneyInterface):
@@ -298,6 +507,76 @@ class MoneyPlain(MoneyInterface):
     __currencyclass__ = CurrencyPlain
 
 
+class MinorMoneyPlain(MinorMoneyInterface):
+    """
+    Implementation in plain mode of MinorMoney
+
+    >>> c1 = CurrencyPlain(1, 'EUR', '€', '&euro;')
+    >>> c4 = CurrencyPlain(4, 'JPY', '¥', '&yen;')
+
+    >>> m1 = MinorMoneyPlain('100.10', 1)
+    >>> print m1
+    100.10 €
+    >>> m1.minor
+    10010
+    >>> m1+10
+    <Money(amount=110.10, currency=1)>
+    >>> m1-MinorMoneyPlain(0.1, 1)
+    <Money(amount=100.00, currency=1)>
+    >>> m1*3
+    <Money(amount=300.30, currency=1)>
+    >>> m1*0.333
+    <Money(amount=33.33, currency=1)>
+    >>> m1/4
+    <Money(amount=25.03, currency=1)>
+    >>> m1 < MinorMoneyPlain(200, 1)
+    True
+    >>> m1 == MinorMoneyPlain(100.1, 1)
+    True
+
+    Allocation never loses a cent
+
+    >>> MinorMoneyPlain('0.05', 1).allocate([1, 1])
+    [<Money(amount=0.03, currency=1)>, <Money(amount=0.02, currency=1)>]
+    >>> sum(MinorMoneyPlain(100, 1).allocate([1, 1, 1]), MinorMoneyPlain(0, 1))
+    <Money(amount=100.00, currency=1)>
+    >>> MinorMoneyPlain('0.05', 1).allocate([0, 1, 1])
+    [<Money(amount=0.00, currency=1)>, <Money(amount=0.03, currency=1)>, <Money(amount=0.02, currency=1)>]
+    >>> MinorMoneyPlain('0.10', 1).allocate([1, 2, 3])
+    [<Money(amount=0.02, currency=1)>, <Money(amount=0.03, currency=1)>, <Money(amount=0.05, currency=1)>]
+    >>> MinorMoneyPlain(1, 1).allocate([1, -1, 1])
+    Traceback (most recent call last):
+    ...
+    ValueError: ratios must not be negative
+    >>> MinorMoneyPlain(1, 1).allocate([0, 0])
+    Traceback (most recent call last):
+    ...
+    ValueError: ratios must not sum to zero
+
+    Exponent of the currency
+
+    >>> print MinorMoneyPlain(1000.4, 4)
+    1000 ¥
+    >>> MinorMoneyPlain(1000, c4).minor
+    1000
+
+    Unknown currencies are not guessed
+
+    >>> MinorMoneyPlain(10, 99)
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown currency id 99
+    >>> MinorMoneyPlain(10, None)
+    Traceback (most recent call last):
+    ...
+    ValueError: MinorMoneyPlain without currency has no minor unit
+    >>> c99 = CurrencyPlain(99, 'KWD', 'KD', 'KD')
+    >>> MinorMoneyPlain('1.2345', 99).minor
+    1235
+    """
+    __currencyclass__ = CurrencyPlain
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,34 @@
+"""
+Timing helpers shared by the bench scripts (python bench/<script>.py puts
+this directory on sys.path, import with: from _util import rate, ...)
+"""
+import sys
+import time
+import timeit
+
+def argument(default):
+    """
+    First command line argument as int (iterations or size), default if missing
+    """
+    return len(sys.argv) > 1 and int(sys.argv[1]) or default
+
+def rate(func, number, repeat=3):
+    """
+    Calls per second of func, best of repeat runs of number calls
+    """
+    return number / min(timeit.repeat(func, number=number, repeat=repeat))
+
+def elapsed(func):
+    """
+    Seconds taken by one call of func, and its result
+    """
+    start = time.time()
+    result = func()
+    return time.time() - start, result
+
+def report(cases, number, unit, width=16):
+    """
+    Prints the rate of each (label, func) of cases
+    """
+    for label, func in cases:
+        print "%-*s %10.0f %s" % (width, label, rate(func, number), unit)
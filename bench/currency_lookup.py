@@ -0,0 +1,21 @@
+"""
+Currency resolution with 200 registered CurrencyPlain currencies: byId,
+byLabel and bySymbol over all of them, and MoneyPlain.currency on new
+objects (cache miss, resolved through byId)
+Run with oxylib importable: python bench/currency_lookup.py [iterations]
+"""
+import itertools
+from _util import argument, report
+from oxylib.Money import CurrencyPlain, MoneyPlain
+
+if __name__ == "__main__":
+    number = argument(200000)
+    for i in xrange(1, 201):
+        CurrencyPlain(i, 'C%03d' % i, 'S%03d' % i, '&#%d;' % i)
+    cycle = itertools.cycle(xrange(1, 201))
+    cases = [("byId(int)", lambda: CurrencyPlain.byId(cycle.next())),
+             ("byId(str)", lambda: CurrencyPlain.byId(str(cycle.next()))),
+             ("byLabel", lambda: CurrencyPlain.byLabel('C%03d' % cycle.next())),
+             ("bySymbol", lambda: CurrencyPlain.bySymbol('S%03d' % cycle.next())),
+             ("MoneyPlain(...).currency", lambda: MoneyPlain(100, cycle.next()).currency)]
+    report(cases, number // 4, "lookups/s", 26)
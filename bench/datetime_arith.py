@@ -0,0 +1,17 @@
+"""
+Throughput of DateTime arithmetic and zone conversion:
+dt + oneDay, dt - other and toTZ
+Run with oxylib importable: python bench/datetime_arith.py [iterations]
+"""
+from _util import argument, report
+from oxylib.DateTime import DateTime, TimeZone, oneDay
+
+if __name__ == "__main__":
+    number = argument(1000000)
+    rome, tokyo = TimeZone('Europe/Rome'), TimeZone('Asia/Tokyo')
+    dt = DateTime(2011, 3, 26, 13, 45, 0, rome)
+    other = DateTime(2011, 1, 1, 0, 0, 0, rome)
+    cases = [("dt + oneDay", lambda: dt + oneDay),
+             ("dt - other", lambda: dt - other),
+             ("dt.toTZ(tokyo)", lambda: dt.toTZ(tokyo))]
+    report(cases, number, "ops/s")
@@ -0,0 +1,20 @@
+"""
+Construction throughput of DateTime from ISO strings, ticks and datetime,
+alone and followed by a read of the zone fields (utcoffset)
+Run with oxylib importable: python bench/datetime_construct.py [iterations]
+"""
+import datetime
+from _util import argument, report
+from oxylib.DateTime import DateTime, TimeZone
+
+if __name__ == "__main__":
+    number = argument(100000)
+    tz = TimeZone('Europe/Rome')
+    value = datetime.datetime(2011, 3, 27, 13, 45, 0)
+    cases = [("DateTime(iso)", lambda: DateTime("2011-03-27T13:45:00", tz)),
+             ("DateTime(ticks)", lambda: DateTime(1301233500, tz)),
+             ("DateTime(datetime)", lambda: DateTime(value, tz)),
+             ("DateTime(iso).utcoffset", lambda: DateTime("2011-03-27T13:45:00", tz).utcoffset),
+             ("DateTime(ticks).utcoffset", lambda: DateTime(1301233500, tz).utcoffset),
+             ("DateTime(datetime).utcoffset", lambda: DateTime(value, tz).utcoffset)]
+    report(cases, number, "objects/s", 30)
@@ -0,0 +1,48 @@
+"""
+Memory per object of DateTime, TimeDelta and RelativeDateTime, measured on
+a list of n objects (DateTimes ten seconds apart from July 2011, clear of
+DST changes) with tracemalloc when available (Python 3 or the
+pytracemalloc backport), else with the growth of the resident set size
+Run with oxylib importable: python bench/datetime_memory.py [n]
+"""
+import gc
+from _util import argument
+from oxylib.DateTime import DateTime, TimeDelta, RelativeDateTime, TimeZone
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+def _rss():
+    # resident set size in bytes (Linux)
+    import os
+    return int(open('/proc/self/statm').read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def measure(build, n):
+    """
+    @return bytes per object of the list built by build(n)
+    """
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+        objects = build(n)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    else:
+        before = _rss()
+        objects = build(n)
+        size = _rss() - before
+    del objects
+    return float(size) / n
+
+if __name__ == "__main__":
+    n = argument(200000)
+    tz = TimeZone('Europe/Rome')
+    cases = [("DateTime", lambda n: [DateTime(1309478400 + i*10, tz) for i in xrange(n)]),
+             ("DateTime (zone fields read)", lambda n: [(d, d.utcoffset, d.dst)[0] for d in (DateTime(1309478400 + i*10, tz) for i in xrange(n))]),
+             ("TimeDelta", lambda n: [TimeDelta(i) for i in xrange(n)]),
+             ("RelativeDateTime", lambda n: [RelativeDateTime(days=i) for i in xrange(n)])]
+    print "measured with %s" % (tracemalloc and "tracemalloc" or "resident set size")
+    for label, build in cases:
+        print "%-28s %8.0f bytes/object" % (label, measure(build, n))
@@ -0,0 +1,17 @@
+"""
+Calls per second of the current instant: DateTime(), DateTime.now()
+and DateTime.utcnow()
+Run with oxylib importable: python bench/datetime_now.py [iterations]
+"""
+from _util import argument, report
+from oxylib.DateTime import DateTime, TimeZone
+
+if __name__ == "__main__":
+    number = argument(100000)
+    tz = TimeZone('Europe/Rome')
+    cases = [("DateTime()", lambda: DateTime()),
+             ("DateTime(tz=Europe/Rome)", lambda: DateTime(tz=tz))]
+    if hasattr(DateTime, "utcnow"):
+        cases += [("DateTime.now(Europe/Rome)", lambda: DateTime.now(tz)),
+                  ("DateTime.utcnow()", DateTime.utcnow)]
+    report(cases, number, "calls/s", 26)
@@ -0,0 +1,18 @@
+"""
+Formatting of n dates with formatDate, formatTime and formatDateTime,
+cycling over three locales
+Run with oxylib importable: python bench/format_dates.py [n]
+"""
+from _util import argument, elapsed
+from oxylib.DateTime import DateTime, TimeZone
+from oxylib.locale import makeLocale
+
+if __name__ == "__main__":
+    n = argument(100000)
+    tz = TimeZone('Europe/Rome')
+    locales = [makeLocale('it_IT'), makeLocale('en_US'), makeLocale('de_DE')]
+    dts = [DateTime(1293840000 + i*3607, tz) for i in xrange(1000)]
+    for method in ('formatDate', 'formatTime', 'formatDateTime'):
+        format = lambda: [getattr(dts[i % 1000], method)(locales[i % 3]) for i in xrange(n)]
+        seconds = elapsed(format)[0]
+        print "%-15s %8.2f s for %d dates, %10.0f dates/s" % (method, seconds, n, n / seconds)
@@ -0,0 +1,44 @@
+"""
+IntervalIndex at n intervals (default 1M booking windows of 30 min to 4 h
+over one year): bulk load, stabbing and one-day overlap queries, insert
+and delete, against a linear scan of the (start, end) pairs
+Run with oxylib importable: python bench/interval_index.py [n]
+"""
+import random
+import numpy
+from _util import argument, elapsed, rate
+from oxylib.DateTime import DateTime, DateTimeArray, IntervalIndex, TimeZone, oneDay, oneHour
+
+if __name__ == "__main__":
+    n = argument(1000000)
+    tz = TimeZone('Europe/Rome')
+    random.seed(1)
+    year = 1293836400
+    starts = numpy.array([year + random.randrange(365*86400) for i in xrange(n)], dtype=numpy.int64)
+    ends = starts + numpy.array([random.randrange(1800, 4*3600) for i in xrange(n)], dtype=numpy.int64)
+
+    seconds, index = elapsed(lambda: IntervalIndex.fromArrays(DateTimeArray(starts, tz), DateTimeArray(ends, tz)))
+    print "%-24s %8.2f s for %d intervals" % ("bulk load (fromArrays)", seconds, len(index))
+
+    instants = [DateTime(year + random.randrange(365*86400), tz) for i in xrange(1000)]
+    queries = iter(instants * 1000)
+    overlapDay = lambda t: index.overlap(t, t + oneDay)
+    insertHour = lambda t: index.insert(t, t + oneHour)
+    print "%-24s %10.0f queries/s (%d hits)" % ("stab", rate(lambda: index.stab(queries.next()), 1000),
+                                                len(index.stab(instants[0])))
+    print "%-24s %10.0f queries/s (%d hits)" % ("overlap, one day", rate(lambda: overlapDay(queries.next()), 1000),
+                                                len(index.overlap(instants[0], instants[0] + oneDay)))
+    handles = []
+    print "%-24s %10.0f ops/s" % ("insert", rate(lambda: handles.append(insertHour(queries.next())), 1000))
+    print "%-24s %10.0f ops/s" % ("delete", rate(lambda: index.delete(handles.pop()), 1000))
+
+    # what the index replaces: a scan of all the pairs
+    pairs = zip(starts.tolist(), ends.tolist())
+    def scan():
+        t = queries.next().gmticks
+        return [p for p in pairs if p[0] <= t <= p[1]]
+    print "%-24s %10.2f queries/s" % ("stab, list scan", rate(scan, 3))
+    def vectorScan():
+        t = queries.next().gmticks
+        return numpy.nonzero((starts <= t) & (ends >= t))[0]
+    print "%-24s %10.0f queries/s" % ("stab, numpy scan", rate(vectorScan, 30))
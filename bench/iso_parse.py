@@ -0,0 +1,18 @@
+"""
+Parse throughput of DateTime strings: strict ISO 8601 parser (fromISO and
+the constructor fast path) against the fuzzy mx fallback
+Run with oxylib importable: python bench/iso_parse.py [iterations]
+"""
+from _util import argument, report
+from oxylib.DateTime import DateTime
+
+if __name__ == "__main__":
+    number = argument(100000)
+    cases = [("DateTime(iso)", lambda: DateTime("2011-03-27T13:45:00")),
+             ("DateTime(iso zone)", lambda: DateTime("2011-03-27T13:45:00 Europe/Rome")),
+             ("DateTime(fuzzy, mx)", lambda: DateTime("2011-3-27T13:45:00"))]
+    if hasattr(DateTime, "fromISO"):
+        cases += [("fromISO(iso)", lambda: DateTime.fromISO("2011-03-27T13:45:00")),
+                  ("fromISO(iso.ffffff+hh:mm)", lambda: DateTime.fromISO("2011-03-27T13:45:00.123456+02:00")),
+                  ("fromISO(iso zone)", lambda: DateTime.fromISO("2011-03-27T13:45:00 Europe/Rome"))]
+    report(cases, number, "parses/s", 28)
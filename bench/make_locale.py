@@ -0,0 +1,14 @@
+"""
+makeLocale() calls per second, cold (first call for a language in the
+process) and warm (repeated calls)
+Run with oxylib importable: python bench/make_locale.py [iterations]
+"""
+from _util import argument, elapsed, rate
+from oxylib.locale import makeLocale
+
+if __name__ == "__main__":
+    number = argument(10000)
+    languages = ['it_IT', 'en_US', 'de_DE', 'fr_FR', 'es_ES', 'pt_BR', 'ja_JP', 'nl_NL']
+    cold = elapsed(lambda: [makeLocale(language) for language in languages])[0] / len(languages)
+    print "%-22s %10.0f calls/s (%d languages)" % ("cold makeLocale(lang)", 1 / cold, len(languages))
+    print "%-22s %10.0f calls/s" % ("warm makeLocale(lang)", rate(lambda: makeLocale('it_IT'), number))
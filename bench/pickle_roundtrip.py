@@ -0,0 +1,23 @@
+"""
+Session save/load round trips: a session-like dict holding DateTimes and
+TimeDeltas, pickled with cPickle (protocol 2, as Beaker) and loaded back
+Run with oxylib importable: python bench/pickle_roundtrip.py [iterations]
+"""
+import cPickle
+from _util import argument, report
+from oxylib.DateTime import DateTime, TimeDelta, TimeZone
+
+if __name__ == "__main__":
+    number = argument(10000)
+    tz = TimeZone('Europe/Rome')
+    session = {'user': 'someone',
+               'login': DateTime(1301233500, tz),
+               'expires': DateTime(1301233500 + 3600, TimeZone()),
+               'idle': TimeDelta(minutes=20),
+               'history': [DateTime(1301233500 + i*97, tz) for i in range(20)]}
+    data = cPickle.dumps(session, 2)
+    print "session pickle %d bytes" % len(data)
+    cases = [("save", lambda: cPickle.dumps(session, 2)),
+             ("load", lambda: cPickle.loads(data)),
+             ("save + load", lambda: cPickle.loads(cPickle.dumps(session, 2)))]
+    report(cases, number, "sessions/s", 12)
@@ -0,0 +1,28 @@
+"""
+Schedule generation with RelativeDateTime products: a 120-month schedule
+built as start + oneMonth * k, plus rates of the scaling operators on a
+repeated delta (memoized) and on fresh deltas (not memoized)
+Run with oxylib importable: python bench/relative_schedule.py [iterations]
+"""
+from _util import argument, rate, report
+from oxylib.DateTime import DateTime, RelativeDateTime, TimeZone
+
+if __name__ == "__main__":
+    number = argument(2000)
+    start = DateTime(1293872400, TimeZone('Europe/Rome'))
+    oneMonth = RelativeDateTime(months=1)
+    weekly = RelativeDateTime(days=7, hour=9, minute=0)
+    counter = iter(xrange(10**9))
+    print "%-28s %10.0f schedules/s" % ("120 products, oneMonth*k",
+                                        rate(lambda: [oneMonth * k for k in range(120)], number))
+    try:
+        print "%-28s %10.0f schedules/s" % ("120 months, start+oneMonth*k",
+                                            rate(lambda: [start + oneMonth * k for k in range(120)], number))
+    except TypeError:
+        # products with float months, as made before, are rejected by some mx builds
+        print "%-28s %10s" % ("120 months, start+oneMonth*k", "n/a")
+    cases = [("oneMonth * 3", lambda: oneMonth * 3),
+             ("weekly / 2", lambda: weekly / 2),
+             ("-weekly", lambda: -weekly),
+             ("fresh delta * 2", lambda: RelativeDateTime(days=counter.next() % 100000) * 2)]
+    report(cases, number * 50, "ops/s", 28)
@@ -0,0 +1,54 @@
+"""
+typeDate/typeDateTime processors on a SQLite in memory table of n rows:
+executemany insert (per-row bind, and bindMany when available), select
+of all the rows, and the result processors fed driver datetimes directly
+(as psycopg2 returns them; the sqlite driver returns strings). Values are
+9 seconds apart from July 2011, clear of DST changes
+Run with oxylib importable: python bench/sqlite_types.py [n]
+"""
+import datetime
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, select
+from sqlalchemy.dialects import sqlite
+from oxylib.DateTime import DateTime, TimeZone
+from oxylib.sqlalchemy import types
+from _util import argument, elapsed
+
+def timed(label, func, n):
+    seconds = elapsed(func)[0]
+    print "%-32s %8.2f s, %10.0f rows/s" % (label, seconds, n / seconds)
+
+if __name__ == "__main__":
+    n = argument(200000)
+    tz = TimeZone('Europe/Rome')
+    engine = create_engine('sqlite://')
+    metadata = MetaData()
+    report = Table('report', metadata,
+                   Column('id', Integer, primary_key=True),
+                   Column('day', types.typeDate),
+                   Column('at', types.typeDateTime))
+    metadata.create_all(engine)
+    conn = engine.connect()
+    values = [DateTime(1309478400 + i*9, tz) for i in xrange(n)]
+
+    timed("insert, per-row bind", lambda: conn.execute(report.insert(),
+          [{'id': i, 'day': v, 'at': v} for i, v in enumerate(values)]), n)
+    if hasattr(types, 'bindMany'):
+        conn.execute(report.delete())
+        def bulk():
+            days, ats = types.bindMany(values, part='date'), types.bindMany(values)
+            conn.execute(report.insert(), [{'id': i, 'day': days[i], 'at': ats[i]} for i in xrange(n)])
+        timed("insert, bindMany", bulk, n)
+    timed("select all rows", lambda: [(row[1], row[2]) for row in conn.execute(select([report]))], n)
+
+    dialect = sqlite.dialect()
+    for label, column, raw in [("typeDate, datetime.date", types.typeDate(),
+                                [datetime.date(2011, 1, 1) + datetime.timedelta(days=i % 3650) for i in xrange(n)]),
+                               ("typeDateTime, datetime", types.typeDateTime(),
+                                [datetime.datetime(2011, 7, 1) + datetime.timedelta(seconds=i*9) for i in xrange(n)])]:
+        process = column.result_processor(dialect, None)
+        try:
+            process(raw[0])
+        except Exception, e:
+            print "%-32s n/a (%s)" % (label, e.__class__.__name__)
+            continue
+        timed(label, lambda: [process(v) for v in raw], n)
@@ -0,0 +1,27 @@
+"""
+Summing 1M TimeDelta durations, plus per-operation rates of the TimeDelta
+arithmetic, comparisons and str()
+Run with oxylib importable: python bench/timedelta_sum.py [n]
+"""
+from _util import argument, elapsed, report
+from oxylib.DateTime import TimeDelta
+
+if __name__ == "__main__":
+    n = argument(1000000)
+    durations = [TimeDelta(seconds=i % 7200) for i in xrange(n)]
+    def total():
+        total = TimeDelta(0)
+        for d in durations:
+            total = total + d
+        return total
+    seconds, total = elapsed(total)
+    print "sum of %d durations %8.2f s, %10.0f adds/s (%s)" % (n, seconds, n / seconds, total)
+    a, b = TimeDelta(hours=1, minutes=30), TimeDelta(seconds=45)
+    cases = [("TimeDelta(seconds=)", lambda: TimeDelta(seconds=5400)),
+             ("a + b", lambda: a + b),
+             ("a - b", lambda: a - b),
+             ("a * 3", lambda: a * 3),
+             ("a / 4", lambda: a / 4),
+             ("a < b", lambda: a < b),
+             ("str(a)", lambda: str(a))]
+    report(cases, n // 10, "ops/s", 20)
@@ -0,0 +1,25 @@
+"""
+Throughput of TimeZone construction and of utcoffset/dst/tzname lookups
+on instants spread across the DST changes of a year
+Run with oxylib importable: python bench/timezone_offsets.py [iterations]
+"""
+from _util import argument, report
+from oxylib.DateTime import DateTime, TimeZone
+
+if __name__ == "__main__":
+    number = argument(100000)
+    tz = TimeZone('Europe/Rome')
+    # one instant every 7 hours over 2011, DST changes on March 27 and October 30
+    dts = [DateTime(1293840000 + i*25200, tz) for i in range(1251)]
+    def lookups(method):
+        state = {'i': 0}
+        def lookup():
+            i = state['i'] = (state['i'] + 1) % len(dts)
+            return method(dts[i])
+        return lookup
+    cases = [("TimeZone(zone)", lambda: TimeZone('Europe/Rome')),
+             ("TimeZone()", lambda: TimeZone()),
+             ("utcoffset", lookups(tz.utcoffset)),
+             ("dst", lookups(tz.dst)),
+             ("tzname", lookups(tz.tzname))]
+    report(cases, number, "ops/s")
@@ -0,0 +1,47 @@
+"""
+Range scans on a SQLite in memory table of n bookings (default 1M over one
+year) stored with compositeDateTime: SQL-side comparisons on the indexed
+UTC column, against loading the rows and filtering the DateTimes in Python
+Run with oxylib importable: python bench/utc_range_scan.py [n]
+"""
+import random
+import datetime
+from sqlalchemy import create_engine, schema, types
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from oxylib.DateTime import DateTime, TimeZone, oneHour, oneDay
+from oxylib.sqlalchemy.plus import compositeDateTime
+from _util import argument, elapsed, rate
+
+Base = declarative_base()
+
+class Booking(Base):
+    __tablename__ = 'booking'
+    id = schema.Column(types.Integer, primary_key=True)
+    start = compositeDateTime('start', index=True)
+
+if __name__ == "__main__":
+    n = argument(1000000)
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    random.seed(1)
+    epoch = datetime.datetime(2011, 1, 1)
+    rows = [{'id': i, 'start_utc': epoch + datetime.timedelta(seconds=random.randrange(365*86400)),
+             'start_zone': 'Europe/Rome'} for i in xrange(n)]
+    seconds = elapsed(lambda: engine.execute(Booking.__table__.insert(), rows))[0]
+    print "%-30s %8.2f s for %d rows" % ("insert", seconds, n)
+
+    session = sessionmaker(bind=engine)()
+    tz = TimeZone('Europe/Rome')
+    # local ranges across the start of DST in Rome
+    low = DateTime(2011, 3, 27, 1, 30, 0, tz)
+    for label, high in [("one hour", low + oneHour), ("one day", low + oneDay)]:
+        query = session.query(Booking).filter(Booking.start.between(low, high))
+        hits = query.count()
+        print "%-30s %10.1f queries/s (%d rows)" % ("SQL range, %s" % label, rate(lambda: query.all(), 10), hits)
+    session.expunge_all()
+
+    # without SQL comparisons: read every DateTime and compare in Python
+    high = low + oneHour
+    seconds, hits = elapsed(lambda: [b for b in session.query(Booking).yield_per(10000) if low <= b.start <= high])
+    print "%-30s %10.4f queries/s (%d rows)" % ("Python filter, one hour", 1 / seconds, len(hits))
@@ -9,6 +9,9 @@ $Id$
 """
 __headUrl__ = '$HeadURL$'
 
+import threading
+from collections import OrderedDict
+
 
 # *************************************************************************** #
 # Custom types
@@ -170,3 +173,64 @@ class kstructElement(object):
             return str(self)
         else:
             return str(self)[0:nchar]
+
+
+####################################################################################################################
+# Caches
+####################################################################################################################
+
+
+class LRUCache(object):
+    """
+    A bounded mapping, evicting the least recently used items.
+    Thread safe, counts hits and misses of get().
+
+    c = LRUCache(maxsize=2)
+    c['a'] = 1
+    c['b'] = 2
+    c.get('a') -> 1
+    c['c'] = 3   # evicts 'b'
+    c.get('b')   -> None
+    c.info()     -> {'hits': 1, 'misses': 1, 'size': 2, 'maxsize': 2}
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self._items), maxsize=self.maxsize)
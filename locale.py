@@ -14,19 +14,32 @@ import warnings
 #############################################################################################
 
 
+# (lang, territory) -> patched Locale, shared by the whole process
+_locales = {}
+
+# request.environ key of the Locale resolved for a request
+ENVIRON_KEY = 'oxylib.locale'
+
 def makeLocale(language_string=None):
     """
     @brief Returns a Locale (from argument or environ)
+    Locales are built and patched once per (lang, territory) and shared,
+    do not modify the returned object.
     @param language_string language to use (None for guessing)
     @return Locale object
     """
 
     lang, territory = 'en', 'US'
+    environ = None
 
     if not language_string:
         # LANGUAGE FROM HTTP LANGUAGE (VIA PYLONS)
         try:
             from pylons import request
+            environ = request.environ
+            locale = environ.get(ENVIRON_KEY)
+            if locale is not None:
+                return locale
             # Do not use request.language, defaults to en-US,
             # request.languages has the correct order
             language_string = request.languages[0]
@@ -51,6 +64,40 @@ def makeLocale(language_string=None):
             lang = language_string.lower()  # only lang
             territory = None
 
+    locale = _locales.get((lang, territory))
+    if locale is None:
+        locale = _locales.setdefault((lang, territory), _buildLocale(lang, territory))
+
+    if environ is not None:
+        try:
+            environ[ENVIRON_KEY] = locale
+        except:
+            pass
+
+    return locale
+
+# Fix patterns
+# always two digits for hours, minutes, seconds, days and months
+# always four digits for year
+_timePatternFixes = [(re.compile(r'\bm\b'), 'mm'),
+                     (re.compile(r'\bh\b'), 'hh'),
+                     (re.compile(r'\bH\b'), 'HH')]
+_timeFormatFixes = [(re.compile('\(m\)'), '(mm)'),
+                    (re.compile('\(h\)'), '(hh)'),
+                    (re.compile('\(H\)'), '(HH)')]
+_fullTimePatternFix = (re.compile(r'\bv\b'), 'z')
+_fullTimeFormatFix = (re.compile('\(v\)'), '(z)')
+_datePatternFixes = [(re.compile(r'\bM\b'), 'MM'),
+                     (re.compile(r'\bd\b'), 'dd'),
+                     (re.compile(r'\byy\b'), 'yyyy')]
+_dateFormatFixes = [(re.compile('\(M\)'), '(MM)'),
+                    (re.compile('\(d\)'), '(dd)'),
+                    (re.compile('\(yy\)'), '(yyyy)')]
+
+def _buildLocale(lang, territory):
+    """
+    @brief Hidden function. Builds a Locale and fixes its patterns
+    """
     try:
         locale = Locale(lang, territory)  # try lang + territory
     except:
@@ -60,32 +107,26 @@ def makeLocale(language_string=None):
             warnings.warn('Error: locale [\'%s\', \'%s\'] not valid; reset to en_US' % (lang, territory))
             locale = Locale('en', 'US')  # reset to en_US
 
-    # Fix patterns
-    # always two digits for hours, minutes, seconds, days and months
-    # always four digits for year
     for format in locale.time_formats:
         pat = locale.time_formats[format]
-        pat.pattern = pat.pattern.replace('.', ':')
-        pat.pattern = re.sub(r'\bm\b', 'mm', pat.pattern)
-        pat.pattern = re.sub(r'\bh\b', 'hh', pat.pattern)
-        pat.pattern = re.sub(r'\bH\b', 'HH', pat.pattern)
-
-        pat.format = pat.format.replace('.', ':')
-        pat.format = re.sub('\(m\)', '(mm)', pat.format)
-        pat.format = re.sub('\(h\)', '(hh)', pat.format)
-        pat.format = re.sub('\(H\)', '(HH)', pat.format)
+        pattern = pat.pattern.replace('.', ':')
+        for regex, repl in _timePatternFixes:
+            pattern = regex.sub(repl, pattern)
+        patformat = pat.format.replace('.', ':')
+        for regex, repl in _timeFormatFixes:
+            patformat = regex.sub(repl, patformat)
         if format == 'full':
-            pat.pattern = re.sub(r'\bv\b', 'z', pat.pattern)
-            pat.format = re.sub('\(v\)', '(z)', pat.format)
+            pattern = _fullTimePatternFix[0].sub(_fullTimePatternFix[1], pattern)
+            patformat = _fullTimeFormatFix[0].sub(_fullTimeFormatFix[1], patformat)
+        pat.pattern, pat.format = pattern, patformat
 
     for format in locale.date_formats:
         pat = locale.date_formats[format]
-        pat.pattern = re.sub(r'\bM\b', 'MM', pat.pattern)
-        pat.pattern = re.sub(r'\bd\b', 'dd', pat.pattern)
-        pat.pattern = re.sub(r'\byy\b', 'yyyy', pat.pattern)
-
-        pat.format = re.sub('\(M\)', '(MM)', pat.format)
-        pat.format = re.sub('\(d\)', '(dd)', pat.format)
-        pat.format = re.sub('\(yy\)', '(yyyy)', pat.format)
+        pattern, patformat = pat.pattern, pat.format
+        for regex, repl in _datePatternFixes:
+            pattern = regex.sub(repl, pattern)
+        for regex, repl in _dateFormatFixes:
+            patformat = regex.sub(repl, patformat)
+        pat.pattern, pat.format = pattern, patformat
 
     return locale
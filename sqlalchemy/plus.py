@@ -9,12 +9,17 @@ Must be imported in <app>/lib/base.py
 $Id$
 """
 
+import threading
+import time
+
 from sqlalchemy import MetaData, schema, types, orm, sql, and_
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.properties import CompositeProperty
 from sqlalchemy.ext.declarative import declared_attr
 
-from oxylib.Money import MoneyInterface, CurrencyInterface
+from oxylib.Money import MoneyInterface, MinorMoneyInterface, CurrencyInterface
+from oxylib.DateTime import DateTime
+from oxylib.sqlalchemy.types import typeUTCDateTime, typeTimeZone
 
 from oxylib.pylons.formatter import Formatter
 
@@ -208,6 +213,11 @@ class CurrencySQLAlchemy(SQLPlus, CurrencyInterface):
     Implementation of oxylib.Money.CurrencyInterface using SQLAlchemy as backend
     Can be extended, actually to define tablename
 
+    Lookups (currencies, byId, byLabel, bySymbol) read through a process wide cache,
+    loaded at first use with all the currencies of the table. Cached currencies
+    are detached from Session (use Session.merge to modify them).
+    Call invalidateCache after changing the table, or set cacheTTL (seconds)
+
     >>> class Currency(CurrencySQLAlchemy): pass
     >>> c = Currency()
     >>> c.label = 'USD'
@@ -226,21 +236,122 @@ class CurrencySQLAlchemy(SQLPlus, CurrencyInterface):
     symbol = schema.Column(types.Unicode(1), nullable=False, default=u'¤')
     html = schema.Column(types.Unicode, nullable=False, default=u'&curren;')
 
+    # seconds before the cache is reloaded, None to keep it until invalidateCache
+    cacheTTL = None
+
+    # class -> cache, see _cache
+    _caches = {}
+    _cacheLock = threading.RLock()
+
     @classmethod
     def currencies(cls):
-        return cls.all()
+        return list(cls._cache()['currencies'])
 
     @classmethod
     def byId(cls, id):
-        return Session.query(cls).get(id)
+        if id is None:
+            return None
+        return cls._lookup('id', int(id))
 
     @classmethod
     def byLabel(cls, label):
-        return cls.get_by('label', label)
+        return cls._lookup('label', label)
 
     @classmethod
     def bySymbol(cls, symbol):
-        return cls.get_by('symbol', symbol)
+        return cls._lookup('symbol', symbol)
+
+    # Cache
+
+    @classmethod
+    def invalidateCache(cls):
+        """
+        Drop the cached currencies, they are reloaded at next lookup
+        """
+        cls._cacheLock.acquire()
+        try:
+            cls._caches.pop(cls, None)
+        finally:
+            cls._cacheLock.release()
+
+    @classmethod
+    def cacheInfo(cls):
+        """
+        Cache statistics: dict with hits, misses, size and loaded (time.time() of last load)
+        """
+        cache = cls._caches.get(cls)
+        if cache is None:
+            return dict(hits=0, misses=0, size=0, loaded=None)
+        return dict(hits=cache['hits'], misses=cache['misses'],
+                    size=len(cache['currencies']), loaded=cache['loaded'])
+
+    @classmethod
+    def _detached(cls, query):
+        """
+        Run query (a function receiving a Query on cls) in a private session sharing
+        the connection of Session, return its results detached
+        """
+        loader = orm.Session(bind=Session.connection(mapper=orm.class_mapper(cls)))
+        try:
+            return query(loader.query(cls))
+        finally:
+            loader.close()
+
+    @classmethod
+    def _cache(cls):
+        """
+        The cache of cls, (re)loaded with all the currencies when missing or expired
+        """
+        cache = cls._caches.get(cls)
+        if cls._expired(cache):
+            cls._cacheLock.acquire()
+            try:
+                old = cls._caches.get(cls)
+                if cls._expired(old):
+                    cache = dict(loaded=time.time(), hits=0, misses=0, currencies=[],
+                                 id={}, label={}, symbol={})
+                    if old:
+                        cache['hits'], cache['misses'] = old['hits'], old['misses']
+                    for currency in cls._detached(lambda query: query.order_by(cls.id).all()):
+                        cls._store(cache, currency)
+                    cls._caches[cls] = cache
+                else:
+                    cache = old  # loaded by an other thread
+            finally:
+                cls._cacheLock.release()
+        return cache
+
+    @classmethod
+    def _expired(cls, cache):
+        return cache is None or (cls.cacheTTL is not None and time.time() - cache['loaded'] > cls.cacheTTL)
+
+    @classmethod
+    def _store(cls, cache, currency):
+        cache['currencies'].append(currency)
+        for field in ('id', 'label', 'symbol'):
+            cache[field].setdefault(getattr(currency, field), currency)
+
+    @classmethod
+    def _lookup(cls, field, value):
+        """
+        Currency by field value, from cache or from the database (then cached)
+        """
+        cache = cls._cache()
+        currency = cache[field].get(value)
+        if currency is not None:
+            cache['hits'] += 1
+            return currency
+        cache['misses'] += 1
+        currency = cls._detached(lambda query: query.filter(getattr(cls, field) == value).first())
+        if currency is not None:
+            cls._cacheLock.acquire()
+            try:
+                if cache['id'].get(currency.id) is None:
+                    cls._store(cache, currency)
+                currency = cache['id'][currency.id]
+            finally:
+                cls._cacheLock.release()
+        return currency
 
 
 class MoneySQLAlchemy(MoneyInterface):
@@ -272,6 +383,45 @@ class MoneySQLAlchemy(MoneyInterface):
         return "%.2f,%d" % (self.amount, self.currency_id)
 
 
+class MinorMoneySQLAlchemy(MinorMoneyInterface):
+    """
+    Implementation of oxylib.Money.MinorMoneyInterface using SQLAlchemy as backend,
+    stored with compositeMoney like MoneySQLAlchemy
+
+    >>> class Currency(CurrencySQLAlchemy): pass
+    >>> c = Currency()
+    >>> c.id = 1
+    >>> c.label = 'USD'
+    >>> c.symbol = '$'
+    >>> class Money(MinorMoneySQLAlchemy): __currencyclass__ = Currency
+
+    >>> m = Money('100.005', c)
+    >>> print m
+    100.01 $
+    >>> m.__composite_values__()
+    (Decimal('100.01'), 1)
+    >>> m.widgetFormat
+    '100.01,1'
+
+    The widget shows the decimal places of the currency
+
+    >>> jpy, bhd = Currency(), Currency()
+    >>> jpy.id, jpy.label, bhd.id, bhd.label = 2, 'JPY', 3, 'BHD'
+    >>> Money(1234, jpy).widgetFormat
+    '1234,2'
+    >>> Money('1.2345', bhd).widgetFormat
+    '1.235,3'
+    """
+    __currencyclass__ = CurrencySQLAlchemy
+
+    def __composite_values__(self):
+        return (self.amount, self.currency_id)
+
+    @property
+    def widgetFormat(self):
+        return "%.*f,%d" % (self.exponent, self.amount, self.currency_id)
+
+
 def compositeMoney(field, cls, default=None):
     """
     Function to create a composite, a pair of fields to contain Money values
@@ -309,6 +459,64 @@ class MoneyComparator(CompositeProperty.Comparator):
                         self.__commontest(other)])
 
 
+# ###########################################################################################################
+# # DateTime with TimeZone, stored in UTC
+
+
+def compositeDateTime(field, index=False):
+    """
+    Function to create a composite, a pair of fields to contain DateTime values
+    keeping their TimeZone: <field>_utc (UTC wall time) and <field>_zone (zone name).
+    Comparisons are made in SQL on <field>_utc, use index=True for range scans
+
+    >>> from sqlalchemy.ext.declarative import declarative_base
+    >>> class Booking(declarative_base()):
+    ...     __tablename__ = 'booking'
+    ...     id = schema.Column(types.Integer, primary_key=True)
+    ...     start = compositeDateTime('start', index=True)
+    >>> print Booking.start < DateTime('2012-06-01T10:00:00 Europe/Rome')
+    booking.start_utc < :start_utc_1
+    """
+    return orm.composite(DateTime,
+                         schema.Column('%s_utc' % field, typeUTCDateTime, index=index),
+                         schema.Column('%s_zone' % field, typeTimeZone),
+                         comparator_factory=DateTimeComparator)
+
+
+class DateTimeComparator(CompositeProperty.Comparator):
+    """
+    Compares instants, on the UTC column only
+    """
+    def __utc(self):
+        return self.__clause_element__().clauses[0]
+
+    def __eq__(self, other):
+        if other is None:
+            return self.__utc() == None
+        return self.__utc() == other.__composite_values__()[0]
+
+    def __ne__(self, other):
+        if other is None:
+            return self.__utc() != None
+        return self.__utc() != other.__composite_values__()[0]
+
+    def __lt__(self, other):
+        return self.__utc() < other.__composite_values__()[0]
+
+    def __le__(self, other):
+        return self.__utc() <= other.__composite_values__()[0]
+
+    def __ge__(self, other):
+        return self.__utc() >= other.__composite_values__()[0]
+
+    def __gt__(self, other):
+        return self.__utc() > other.__composite_values__()[0]
+
+    def between(self, start, end, symmetric=False):
+        return self.__utc().between(start.__composite_values__()[0], end.__composite_values__()[0],
+                                    symmetric=symmetric)
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
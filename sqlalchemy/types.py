@@ -6,12 +6,46 @@ $Id
 """
 __headUrl__ = '$HeadURL$'
 
-__all__ = ['typeDate', 'typeTime', 'typeDateTime']
+__all__ = ['typeDate', 'typeTime', 'typeDateTime', 'typeUTCDateTime', 'typeTimeZone', 'bindMany']
 
-from oxylib.DateTime import Date, DateTime, Time
+import datetime as pydt
+from oxylib.DateTime import Date, DateTime, DateTimeArray, Time, TimeZone
 # from oxylib.sqlalchemy.plus import Money
 from sqlalchemy import types
 
+_EPOCH = pydt.datetime(1970, 1, 1)
+
+
+def _utcWall(value, microseconds=False):
+    """
+    @brief Hidden function. UTC wall time of a DateTime as naive python datetime
+    @param microseconds keep the fraction of second (default seconds precision)
+    """
+    if microseconds:
+        return _EPOCH + pydt.timedelta(seconds=value.gmticks)
+    return _EPOCH + pydt.timedelta(seconds=int(value.gmticks // 1))
+
+
+def bindMany(values, part='full'):
+    """
+    @brief Binds a column of DateTimes at once, for executemany inserts.
+    The bound strings are accepted as they are by typeDate and typeDateTime
+    @param values list of DateTime objects (or None)
+    @param part 'full' for typeDateTime, 'date' for typeDate
+    @return list of strings (or None)
+    """
+    present = [v for v in values if v is not None]
+    if not present:
+        return list(values)
+    bound = iter(DateTimeArray.fromList(present, TimeZone()).formatISO(offset=False, part=part).tolist())
+    result = []
+    for value in values:
+        if value is None:
+            result.append(None)
+        else:
+            result.append(bound.next())
+    return result
+
 
 class typeDate(types.TypeDecorator):
 
@@ -28,13 +62,19 @@ class typeDate(types.TypeDecorator):
         def process(value):
             if value is None:
                 return None
-            return value.toUTC().formatISO(offset=False, part='date')
+            if isinstance(value, basestring):
+                return value  # already bound (bindMany)
+            return _utcWall(value).date().isoformat()
         return process
 
     def result_processor(self, dialect, coltype):
+        utc = TimeZone()
+
         def process(value):
             if value is None:
                 return None
+            if isinstance(value, pydt.date):
+                return Date._fromDatetime(value, utc)
             return Date(value)
         return process
 
@@ -54,13 +94,19 @@ class typeDateTime(types.TypeDecorator):
         def process(value):
             if value is None:
                 return None
-            return value.toUTC().formatISO(offset=False)
+            if isinstance(value, basestring):
+                return value  # already bound (bindMany)
+            return _utcWall(value).isoformat()
         return process
 
     def result_processor(self, dialect, coltype):
+        utc = TimeZone()
+
         def process(value):
             if value is None:
                 return None
+            if isinstance(value, pydt.datetime):
+                return DateTime._fromDatetime(value, utc)
             return DateTime(value)
         return process
 
@@ -89,3 +135,53 @@ class typeTime(types.TypeDecorator):
                 return None
             return Time(value)
         return process
+
+
+class typeUTCDateTime(types.TypeDecorator):
+    """
+    DateTime stored as its UTC wall time (naive TIMESTAMP, microseconds kept),
+    read back in UTC. SQL comparisons on the column compare instants,
+    see oxylib.sqlalchemy.plus.compositeDateTime to keep the TimeZone
+    """
+
+    impl = types.DateTime
+
+    @property
+    def python_type(self):
+        return DateTime
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, pydt.datetime):
+            return value  # naive UTC
+        return _utcWall(value, microseconds=True)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return DateTime._fromDatetime(value, TimeZone())
+
+
+class typeTimeZone(types.TypeDecorator):
+    """
+    TimeZone stored as its zone name
+    """
+
+    impl = types.String(64)
+
+    @property
+    def python_type(self):
+        return TimeZone
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, TimeZone):
+            return value.zone
+        return TimeZone(value).zone
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return TimeZone(value)
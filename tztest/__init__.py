@@ -1,4 +1,6 @@
 import os, sys, time, re
+import hashlib
+import json
 from ConfigParser import ConfigParser
 import windows_tz
 
@@ -152,11 +154,30 @@ all_timezones = ['Africa/Abidjan', 'Africa/Accra', 'Africa/Addis_Ababa',
 zoneinfo_locations = ['/usr/share/zoneinfo', '/usr/share/lib/zoneinfo', 
                       '/usr/lib/zoneinfo', '/etc/zoneinfo']
 
-def compare_zoneinfo(tzfilename):
-    if not os.path.exists(tzfilename):
-        return None
-    localtime = open(tzfilename, 'rb').read()
-    
+# Set to a file name to persist the zoneinfo index between processes
+zoneinfo_index_file = None
+
+# (stamp, {digest: zone}) of the zoneinfo tree, see zoneinfo_index
+_zoneinfo_index = (None, None)
+_all_timezones = set(all_timezones)
+
+def _digest(filename):
+    return hashlib.sha1(open(filename, 'rb').read()).hexdigest()
+
+def _zoneinfo_stamp():
+    # The mtime of the zoneinfo roots only, a stat per root: tzdata updates
+    # replace the top level files (zone.tab, tzdata.zi...) too. Changes made
+    # only inside a subdirectory need invalidate_zoneinfo_index()
+    stamp = []
+    for path in zoneinfo_locations:
+        try:
+            stamp.append([path, os.stat(path).st_mtime])
+        except OSError:
+            continue
+    return stamp
+
+def _build_zoneinfo_index():
+    index = {}
     # These are the possible locations I have found:
     for path in zoneinfo_locations:
         if not os.path.exists(path):
@@ -171,18 +192,91 @@ def compare_zoneinfo(tzfilename):
                 if os.path.islink(zoneinfopath):
                     # We only want real files now.
                     continue
-                zoneinfo = open(zoneinfopath, 'rb').read()
-                if zoneinfo == localtime:
-                    timezone = zoneinfopath[len(path)+1:]
-                    if timezone in all_timezones:
-                        return timezone
-    return None
+                timezone = zoneinfopath[len(path)+1:]
+                if timezone in _all_timezones:
+                    # first match wins, as in a sequential scan
+                    index.setdefault(_digest(zoneinfopath), timezone)
+    return index
+
+def _load_zoneinfo_index(stamp):
+    try:
+        data = json.load(open(zoneinfo_index_file))
+    except (IOError, ValueError):
+        return None
+    if data.get('stamp') != stamp:
+        return None
+    return data.get('index')
+
+def _save_zoneinfo_index(stamp, index):
+    tmpname = '%s.%d' % (zoneinfo_index_file, os.getpid())
+    try:
+        tmpfile = open(tmpname, 'w')
+        json.dump({'stamp': stamp, 'index': index}, tmpfile)
+        tmpfile.close()
+        os.rename(tmpname, zoneinfo_index_file)
+    except (IOError, OSError):
+        # persisting is only an optimization
+        pass
+
+def zoneinfo_index():
+    """Content hash -> zone name index of the zoneinfo files, rebuilt
+    (or reloaded from zoneinfo_index_file) when the mtime of a zoneinfo
+    root changes or after invalidate_zoneinfo_index()"""
+    global _zoneinfo_index
+    stamp = _zoneinfo_stamp()
+    cached_stamp, index = _zoneinfo_index
+    if index is None or cached_stamp != stamp:
+        index = None
+        if zoneinfo_index_file:
+            index = _load_zoneinfo_index(stamp)
+        if index is None:
+            index = _build_zoneinfo_index()
+            if zoneinfo_index_file:
+                _save_zoneinfo_index(stamp, index)
+        _zoneinfo_index = (stamp, index)
+    return index
+
+def invalidate_zoneinfo_index():
+    """Forget the zoneinfo index (and zoneinfo_index_file), it is rebuilt
+    on the next lookup"""
+    global _zoneinfo_index
+    _zoneinfo_index = (None, None)
+    if zoneinfo_index_file:
+        try:
+            os.remove(zoneinfo_index_file)
+        except OSError:
+            pass
+
+def compare_zoneinfo(tzfilename):
+    if not os.path.exists(tzfilename):
+        return None
+    return zoneinfo_index().get(_digest(tzfilename))
+
+# (key, zone) of the last detection, see get_zone
+_cached_zone = (None, None)
+
+def _zone_key():
+    # The detected zone stays valid as long as TZ and /etc/localtime
+    # (the link and the file it points to) are unchanged
+    stamps = [os.environ.get('TZ')]
+    for stat in (os.lstat, os.stat):
+        try:
+            stamps.append(stat('/etc/localtime').st_mtime)
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
 
 def get_zone():
-    if sys.platform == "win32":
-        return get_win_timezone()
-    else:
-        return get_unix_timezone()
+    global _cached_zone
+    key = _zone_key()
+    cached_key, timezone = _cached_zone
+    if timezone is None or cached_key != key:
+        if sys.platform == "win32":
+            timezone = get_win_timezone()
+        else:
+            timezone = get_unix_timezone()
+        _cached_zone = (key, timezone)
+    return timezone
         
 def get_unix_timezone():
     ### First we gather information:
@@ -290,9 +384,6 @@ def get_unix_timezone():
             msg = "No reliable timezone found. Using time.tzinfo."
     
     # And in the end, we print it all out:
-    pipe = os.popen("uname -a")
-    uname = pipe.read().strip()
-    # print("OS:                   " + uname)
     # print("Platform:             " + sys.platform)
     # print("TZ:                   " + repr(tzenv))
     # print("Config files:         " + ':'.join(localconfigs))